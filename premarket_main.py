@@ -1,6 +1,5 @@
 import argparse
 import json
-import math
 import os
 from datetime import datetime, date
 
@@ -25,7 +24,7 @@ from src.market_environment import get_market_environment
 from src.ml_scorer import MLScorer
 from src.snapshot import load_snapshot, calculate_yearly_pnl, create_year_start_snapshot, save_snapshot
 from src.momentum import rank_by_momentum, print_momentum_report, calculate_alpha_batch, calculate_alpha_3y_batch, calculate_trend_state_batch
-from src.notifier import GmailNotifier
+from src.notifier import GmailNotifier, REPORT_SKIPPED
 from src.wave_scanner import scan_waves
 from src.breadth_monitor import get_breadth_status
 from src.deviation_tracker import print_deviation_report
@@ -559,12 +558,13 @@ def _run_tw_section(portfolio, actions_output):
     return tw_actions
 
 
-def run_premarket(scan_tw=False, send_email=True):
+def run_premarket(scan_tw=False, send_email=True, force_email=False):
     """產出盤前建議（動能策略 + 三層出場）
 
     Args:
         scan_tw: 是否掃描台股（預設 False）
         send_email: 是否發送 Email（預設 True，--no-email 時為 False）
+        force_email: 內容與上次寄出相同時仍強制發送（--force-email）
     """
     os.makedirs("data", exist_ok=True)
     today_str = date.today().strftime("%Y%m%d")
@@ -761,7 +761,7 @@ def run_premarket(scan_tw=False, send_email=True):
             continue  # 已在持倉或 ADD 清單中
         _wc_action_id += 1
         price = wc["current_price"]
-        suggested = math.floor(portfolio.get("cash", 0) / price) if price > 0 else 0
+        suggested = int(portfolio.get("cash", 0) // price) if price > 0 else 0
         suggested = min(suggested, wc["shares"])  # 不超過原本持有股數
         actions.append({
             "id": _wc_action_id,
@@ -790,7 +790,7 @@ def run_premarket(scan_tw=False, send_email=True):
         for a in buying_slots:
             price = a.get("current_price", 0)
             if price > 0:
-                a["suggested_shares_post_rotate"] = math.floor(post_rotate_per_slot / price)
+                a["suggested_shares_post_rotate"] = int(post_rotate_per_slot // price)
 
     # 5.8 補充板塊資訊到所有 actions（共用 Wikipedia 快取，無額外 HTTP 請求）
     sector_map = get_sp500_sector_map()
@@ -1360,7 +1360,10 @@ def run_premarket(scan_tw=False, send_email=True):
         notifier = GmailNotifier()
         if notifier.is_configured():
             print("正在發送 Email 通知...")
-            if notifier.send_premarket_report(actions_output):
+            result = notifier.send_premarket_report(actions_output, force=force_email)
+            if result == REPORT_SKIPPED:
+                print("報告內容與上次寄出相同，跳過 Email 發送（--force-email 可強制寄送）")
+            elif result:
                 print(f"Email 已發送至 {notifier.recipient}")
             else:
                 print("Email 發送失敗，請檢查 .env 設定")
@@ -1449,6 +1452,7 @@ def main():
     parser.add_argument("--deviation", nargs="?", const=30, type=int,
                         metavar="DAYS", help="偏離成本追蹤（預設近30天）")
     parser.add_argument("--no-email", action="store_true", help="跳過 Email 發送（測試用）")
+    parser.add_argument("--force-email", action="store_true", help="報告內容未變也強制發送 Email")
     args = parser.parse_args()
 
     if args.init:
@@ -1462,7 +1466,8 @@ def main():
     elif args.deviation:
         print_deviation_report(days=args.deviation)
     else:
-        run_premarket(scan_tw=args.tw, send_email=not args.no_email)
+        run_premarket(scan_tw=args.tw, send_email=not args.no_email,
+                      force_email=args.force_email)
 
 
 if __name__ == "__main__":
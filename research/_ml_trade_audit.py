@@ -17,6 +17,7 @@ import numpy as np
 import pandas as pd
 import yfinance as yf
 from datetime import date, timedelta
+from src.portfolio import load_all_transactions
 
 warnings.filterwarnings("ignore")
 
@@ -51,7 +52,7 @@ SECTOR_ETFS = sorted(set(SECTOR_ETF_MAP.values()))
 def load_trades():
     with open("data/portfolio.json") as f:
         port = json.load(f)
-    txns = port.get("transactions", [])
+    txns = load_all_transactions(port)
     adds  = [t for t in txns if t.get("action") == "ADD"]
     exits = [t for t in txns if t.get("action") == "EXIT"]
     return adds, exits, port
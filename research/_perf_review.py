@@ -19,6 +19,7 @@ warnings.filterwarnings("ignore")
 import numpy as np
 import yfinance as yf
 from datetime import date
+from src.portfolio import load_all_transactions
 
 # ── 讀取快照 & 持倉 ──────────────────────────────────────────────────────────
 with open("data/snapshot_2026.json") as f:
@@ -184,7 +185,7 @@ print()
 print("=" * 65)
 print("  交易紀錄分析（2026-02-12 起，系統啟用後）")
 print("-" * 65)
-txns = port["transactions"]
+txns = load_all_transactions(port)
 adds  = [t for t in txns if t["action"] == "ADD"]
 exits = [t for t in txns if t["action"] == "EXIT"]
 print(f"  ADD 交易 {len(adds)} 筆  EXIT 交易 {len(exits)} 筆")
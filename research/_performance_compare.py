@@ -31,6 +31,7 @@ import numpy as np
 import pandas as pd
 import yfinance as yf
 from datetime import date
+from src.portfolio import load_all_transactions
 
 warnings.filterwarnings("ignore")
 
@@ -144,7 +145,7 @@ def scenario_system(port, current_prices):
                       + sum(-net_pnl_for_exited_loss) for exited warning ADDs
     等價於：系統版 = Actual - 所有警告 ADD 的累計損益（若負，系統版更好）
     """
-    txns = port["transactions"]
+    txns = load_all_transactions(port)
 
     # 找出警告期 ADD（只計主要警告期，不含今天）
     warning_adds = [
@@ -235,7 +236,7 @@ def main():
     # 收集所有需要現價的 symbol
     jan1_syms = set(snap["positions"].keys())
     curr_syms = set(port["positions"].keys())
-    txn_syms  = {t["symbol"] for t in port["transactions"]}
+    txn_syms  = {t["symbol"] for t in load_all_transactions(port)}
     all_syms  = jan1_syms | curr_syms | txn_syms | {"SPY"}
 
     print("下載現價...")
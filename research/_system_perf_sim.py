@@ -24,6 +24,7 @@ warnings.filterwarnings("ignore")
 import numpy as np
 import yfinance as yf
 from datetime import date, datetime
+from src.portfolio import load_all_transactions
 
 # ── 載入資料 ──────────────────────────────────────────────────────────────────
 with open("data/portfolio.json") as f:
@@ -46,7 +47,7 @@ for fname in actions_files:
                 all_syms.add(s)
 for pos in port["positions"]:
     all_syms.add(pos)
-for t in port["transactions"]:
+for t in load_all_transactions(port):
     all_syms.add(t["symbol"])
 
 print(f"取得 {len(all_syms)} 檔最新報價...")
@@ -24,6 +24,7 @@ import numpy as np
 import pandas as pd
 import yfinance as yf
 from datetime import datetime, timedelta
+from src.portfolio import load_all_transactions
 
 # ── 資料 ─────────────────────────────────────────────────────────────────────
 OHLCV_PATH = "data/_protection_bt_ohlcv.pkl"
@@ -74,7 +75,7 @@ def get_price_at(sym, date_str):
 
 # ── 從交易記錄找出「明確停損出場」───────────────────────────────────────────
 # 策略：若某 EXIT 對應同期有 ADD/BUY，且虧損 ≥ -12%，視為停損出場
-txs_global = portfolio["transactions"]
+txs_global = load_all_transactions(portfolio)
 
 # 建立每支股票的 buy/sell 對應
 from collections import defaultdict
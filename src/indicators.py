@@ -1,9 +1,22 @@
+import numpy as np
 import pandas_ta as ta
 
+try:
+    import talib  # 選用：C 實作指標較快，未安裝時退回 pandas / pandas_ta
+except ImportError:
+    talib = None
+
 def add_ma_indicators(df, length=60):
-    df[f'MA{length}'] = ta.sma(df['Close'], length=length)
+    if talib is not None:
+        df[f'MA{length}'] = talib.SMA(df['Close'].to_numpy(np.float64), timeperiod=length)
+    else:
+        # 與 ta.sma 相同（未滿 length 天為 NaN），省去 pandas_ta 的包裝與檢查
+        df[f'MA{length}'] = df['Close'].rolling(length, min_periods=length).mean()
     return df
 
 def add_rsi_indicators(df, length=14):
-    df['RSI'] = ta.rsi(df['Close'], length=length)
+    if talib is not None:
+        df['RSI'] = talib.RSI(df['Close'].to_numpy(np.float64), timeperiod=length)
+    else:
+        df['RSI'] = ta.rsi(df['Close'], length=length)
     return df
@@ -2,6 +2,7 @@
 
 計算個股動能分數，用於排名和篩選候選標的。
 """
+import sys
 import yfinance as yf
 import pandas as pd
 from concurrent.futures import ThreadPoolExecutor, as_completed
@@ -170,7 +171,7 @@ def rank_by_momentum(symbols: list, period: int = 21, top_n: int = None, include
         results = []
         for i, (symbol, data) in enumerate(ranked):
             results.append({
-                "symbol": symbol,
+                "symbol": sys.intern(symbol),
                 "momentum": data["momentum"],
                 "momentum_short": data.get("momentum_short"),
                 "momentum_long": data.get("momentum_long"),
@@ -183,7 +184,7 @@ def rank_by_momentum(symbols: list, period: int = 21, top_n: int = None, include
         results = []
         for i, (symbol, momentum) in enumerate(ranked):
             results.append({
-                "symbol": symbol,
+                "symbol": sys.intern(symbol),
                 "momentum": momentum,
                 "rank": i + 1,
             })
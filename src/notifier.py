@@ -1,17 +1,100 @@
 """Gmail SMTP 通知模組"""
+import bisect
+import hashlib
+import json
 import smtplib
 import os
 import datetime
 import pathlib
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
-from email.mime.application import MIMEApplication
+from collections import OrderedDict
+from email.message import EmailMessage
 from dotenv import load_dotenv
 
 from src.risk import TRANCHE_PARAMS
 
 load_dotenv()
 
+GREEN_DOT = "🟢"
+YELLOW_DOT = "🟡"
+ORANGE_DOT = "🟠"
+RED_DOT = "🔴"
+TW_FLAG = "🇹🇼"
+COLOR_GAIN = "#28a745"
+COLOR_LOSS = "#dc3545"
+COLOR_WARN = "#fd7e14"
+
+_ALPHA_THRESHOLDS = (-20, 0)        # alpha ≤ -20 🔴 / ≤ 0 🟡 / > 0 🟢
+_TW_ALPHA_THRESHOLDS = (-10, 0)     # 台股 vs 0050 門檻較窄
+_ALPHA_EMOJIS = (RED_DOT, YELLOW_DOT, GREEN_DOT)
+_REPORT_CACHE_SIZE = 8
+LAST_REPORT_HASH_PATH = os.path.join("data", ".last_report_hash")
+_VOLATILE_REPORT_KEYS = ("date", "generated_at")  # 內容比對時忽略（每天必變）
+REPORT_SKIPPED = "skipped"  # send_premarket_report：內容未變而未寄出
+
+
+def _alpha_emoji(v, thresholds=_ALPHA_THRESHOLDS, emojis=_ALPHA_EMOJIS):
+    """依 alpha 區間回傳燈號"""
+    return emojis[bisect.bisect_left(thresholds, v)]
+
+
+def _pnl_color(v, zero_is_gain=True):
+    """損益顏色：>= 0 綠、< 0 或缺值紅
+
+    zero_is_gain=False 時 0 也算紅（EXIT / ROTATE 賣出列沿用此規則）
+    """
+    if v is None or (v == 0 and not zero_is_gain):
+        return COLOR_LOSS
+    return COLOR_GAIN if v >= 0 else COLOR_LOSS
+
+
+# Email 本文（摘要）骨架：section 由 _format_summary_html 填入
+_SUMMARY_HTML_SKELETON = '''<html>
+<body style="font-family:Arial,sans-serif;max-width:620px;margin:0 auto;padding:20px;color:#333;">
+  <h2 style="margin-bottom:4px;">盤前報告 {date}</h2>
+  <p style="color:#6c757d;margin:0 0 12px;font-size:12px;">版本 {version} &nbsp;|&nbsp; {regime_str}</p>
+
+  <div style="background:#f8f9fa;padding:12px 16px;border-radius:6px;margin-bottom:12px;font-size:13px;">
+    <strong>投組總值: ${total_value:,.0f}</strong>
+    &nbsp;&nbsp; 現金: ${cash:,.0f}
+    &nbsp;&nbsp; 個股: {individual_count}/30{yearly_str}
+  </div>
+
+  {sector_html}
+  {menv_html}
+  {triple_html}
+  {exit_html}
+  {rotate_html}
+  {add_html}
+  {hold_html}
+  {tw_section_html}
+
+  <p style="color:#aaa;font-size:11px;margin-top:20px;">📎 完整持倉表、建議詳情請見附件 PDF</p>
+  <hr style="border:none;border-top:1px solid #eee;margin:12px 0;">
+  <p style="color:#ccc;font-size:10px;">此郵件由盤前建議系統自動發送</p>
+</body>
+</html>'''
+
+# 完整報告（PDF）開頭：標題 + 投組摘要表（年度 P&L 列由 _format_html_report 接續寫入）
+_REPORT_HTML_HEAD = '''
+        <html>
+        <body style="font-family:Arial,sans-serif;padding:16px;color:#333;">
+            <h2>盤前報告 {date}</h2>
+            <p style="color:#6c757d;">版本 {version}</p>
+
+            <table style="border-collapse:collapse;width:100%;margin:20px 0;">
+                <tr><td style="padding:8px;border-bottom:1px solid #ddd;">投組總值</td><td style="padding:8px;border-bottom:1px solid #ddd;"><strong>${total_value:,.2f}</strong></td></tr>
+                <tr><td style="padding:8px;border-bottom:1px solid #ddd;">現金</td><td style="padding:8px;border-bottom:1px solid #ddd;">${cash:,.2f}</td></tr>
+                <tr><td style="padding:8px;border-bottom:1px solid #ddd;">個股</td><td style="padding:8px;border-bottom:1px solid #ddd;">{individual_count}/30 檔</td></tr>
+                '''
+
+_REPORT_HTML_TAIL = '''
+
+            <hr style="margin:30px 0;border:none;border-top:1px solid #ddd;">
+            <p style="color:#6c757d;font-size:12px;">此郵件由盤前建議系統自動發送</p>
+        </body>
+        </html>
+        '''
+
 
 class GmailNotifier:
     """Gmail SMTP 郵件發送器"""
@@ -20,33 +103,46 @@ class GmailNotifier:
         self.sender = os.getenv("GMAIL_SENDER", "")
         self.password = os.getenv("GMAIL_APP_PASSWORD", "")
         self.recipient = os.getenv("GMAIL_RECIPIENT", "")
+        # GMAIL_RECIPIENT 可用逗號分隔多位收件人
+        self.recipients = [r.strip() for r in self.recipient.split(",") if r.strip()]
         self.enabled = os.getenv("EMAIL_ENABLED", "false").lower() == "true"
+        self._report_cache = OrderedDict()  # report_key -> (text, summary_html, full_html)
 
     def is_configured(self):
         """檢查是否已設定必要參數"""
-        return all([self.sender, self.password, self.recipient, self.enabled])
+        return all([self.sender, self.password, self.recipients, self.enabled])
 
-    def send_premarket_report(self, actions_data):
+    def send_premarket_report(self, actions_data, force=False, recipients=None):
         """發送盤前報告
 
+        內容（忽略日期欄位）與上次成功寄出的報告相同時跳過發送，
+        避免假日 / 無新資料時重複寄信。
+
         Args:
             actions_data: actions JSON 資料（與儲存到檔案的格式相同）
+            force: True 時即使內容未變也照常發送
+            recipients: 收件人 list（可選，預設為 GMAIL_RECIPIENT 設定）
 
         Returns:
-            bool: 是否發送成功
+            True: 發送成功；False: 未設定或發送失敗；
+            REPORT_SKIPPED: 內容與上次相同而跳過（未寄出）
         """
         if not self.is_configured():
             return False
 
+        content_key = self._report_key(
+            {k: v for k, v in actions_data.items() if k not in _VOLATILE_REPORT_KEYS}
+        ).hex()
+        if not force and self._read_last_report_hash() == content_key:
+            return REPORT_SKIPPED
+
         portfolio = actions_data.get("portfolio_snapshot", {})
         total_value = portfolio.get("total_value", 0)
 
         regime = actions_data.get("regime_status", {})
         regime_tag = " 🔴BEAR" if not regime.get("is_bull", True) else ""
         subject = f"盤前報告 {actions_data['date']} | 投組 ${total_value:,.0f}{regime_tag}"
-        text_body = self._format_text_report(actions_data)
-        summary_html = self._format_summary_html(actions_data)
-        full_html = self._format_html_report(actions_data)
+        text_body, summary_html, full_html = self._render_reports(actions_data)
 
         data_dir = pathlib.Path("data")
         year = datetime.date.today().year
@@ -63,7 +159,54 @@ class GmailNotifier:
             report_date = actions_data.get("date", str(datetime.date.today())).replace("-", "")
             attachments.insert(0, (f"premarket_{report_date}.pdf", pdf_bytes))
 
-        return self._send_email(subject, text_body, summary_html, attachments=attachments)
+        sent = self._send_email(subject, text_body, summary_html,
+                                attachments=attachments, recipients=recipients)
+        if sent:
+            self._write_last_report_hash(content_key)
+        return sent
+
+    @staticmethod
+    def _read_last_report_hash(path=LAST_REPORT_HASH_PATH):
+        """讀取上次成功寄出報告的內容雜湊，不存在則回傳 None"""
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                return f.read().strip()
+        except OSError:
+            return None
+
+    @staticmethod
+    def _write_last_report_hash(content_key, path=LAST_REPORT_HASH_PATH):
+        """記錄本次寄出報告的內容雜湊"""
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, "w", encoding="utf-8") as f:
+                f.write(content_key)
+        except OSError as e:
+            print(f"報告雜湊寫入失敗: {e}")
+
+    @staticmethod
+    def _report_key(actions_data):
+        """actions_data 內容雜湊（key 排序，與 dict 插入順序無關）"""
+        raw = json.dumps(actions_data, sort_keys=True, ensure_ascii=False, default=str)
+        return hashlib.blake2b(raw.encode("utf-8"), digest_size=16).digest()
+
+    def _render_reports(self, actions_data):
+        """產生 (純文字, 摘要 HTML, 完整 HTML)；同內容重送（SMTP 失敗重試等）直接取快取"""
+        key = self._report_key(actions_data)
+        cached = self._report_cache.get(key)
+        if cached is not None:
+            self._report_cache.move_to_end(key)
+            return cached
+
+        rendered = (
+            self._format_text_report(actions_data),
+            self._format_summary_html(actions_data),
+            self._format_html_report(actions_data),
+        )
+        self._report_cache[key] = rendered
+        if len(self._report_cache) > _REPORT_CACHE_SIZE:
+            self._report_cache.popitem(last=False)
+        return rendered
 
     def _generate_pdf(self, html_content):
         """將 HTML 報告轉為 PDF bytes（A4 橫向）"""
@@ -118,16 +261,16 @@ class GmailNotifier:
         yearly_str = ""
         if yearly:
             sign = "+" if yearly["pnl_amount"] >= 0 else ""
-            color = "#28a745" if yearly["pnl_amount"] >= 0 else "#dc3545"
+            color = _pnl_color(yearly["pnl_amount"])
             yearly_str = f' &nbsp;<span style="color:{color};">{sign}${yearly["pnl_amount"]:,.0f} ({sign}{yearly["pnl_pct"]:.1f}% YTD)</span>'
 
         # 市場體制
         if regime.get("is_bull", True):
             pct = f"+{regime.get('pct_vs_ma200', 0):.1f}%"
-            regime_str = f'<span style="color:#28a745;">🟢 BULL SPY {pct} vs MA200</span>'
+            regime_str = f'<span style="color:{COLOR_GAIN};">{GREEN_DOT} BULL SPY {pct} vs MA200</span>'
         else:
             pct = f"{regime.get('pct_vs_ma200', 0):.1f}%"
-            regime_str = f'<span style="color:#dc3545;">🔴 BEAR SPY {pct} vs MA200</span>'
+            regime_str = f'<span style="color:{COLOR_LOSS};">{RED_DOT} BEAR SPY {pct} vs MA200</span>'
 
         # 板塊概況（一行）
         sector_html = ""
@@ -137,7 +280,7 @@ class GmailNotifier:
             for name, s in sectors_data.items():
                 pct_val = s.get("vs_spy_5d")
                 if pct_val is not None:
-                    c = "#28a745" if pct_val >= 0 else "#dc3545"
+                    c = _pnl_color(pct_val)
                     parts.append(f'<span style="color:{c};">{name} {pct_val:+.1f}%</span>')
             if parts:
                 sector_html = f'<p style="margin:6px 0;font-size:12px;">板塊 vs SPY (5d): {" &nbsp;|&nbsp; ".join(parts)}</p>'
@@ -147,7 +290,7 @@ class GmailNotifier:
         menv_html = ""
         if menv.get("regime_label"):
             emoji = menv.get("regime_emoji", "")
-            regime_color = "#dc3545" if emoji == "🔴" else ("#fd7e14" if emoji == "🟠" else "#28a745")
+            regime_color = COLOR_LOSS if emoji == RED_DOT else (COLOR_WARN if emoji == ORANGE_DOT else COLOR_GAIN)
             parts = []
             if menv.get("vix_level") is not None:
                 parts.append(f"VIX {menv['vix_level']:.1f}")
@@ -168,9 +311,9 @@ class GmailNotifier:
                 ts_state = (d.get("trend_state") or {}).get("state", "")
                 ts_str   = "↘️轉弱" if ts_state == "轉弱" else ("→" if ts_state == "盤整" else "")
                 fh_str   = f"{d['from_high_pct']:+.0f}%" if d.get("from_high_pct") is not None else "—"
-                def_rows += f'<tr><td style="padding:4px 8px;font-weight:bold;">{d["symbol"]}</td><td style="padding:4px 8px;color:#dc3545;">{mom_str}</td><td style="padding:4px 8px;">{pnl_str}</td><td style="padding:4px 8px;">{ts_str}</td><td style="padding:4px 8px;">{fh_str}</td></tr>'
+                def_rows += f'<tr><td style="padding:4px 8px;font-weight:bold;">{d["symbol"]}</td><td style="padding:4px 8px;color:{COLOR_LOSS};">{mom_str}</td><td style="padding:4px 8px;">{pnl_str}</td><td style="padding:4px 8px;">{ts_str}</td><td style="padding:4px 8px;">{fh_str}</td></tr>'
             def_table = f'<p style="margin:6px 0;font-size:12px;"><strong>防禦性減倉候選（動能轉負，尚未觸停損）：</strong></p><table style="border-collapse:collapse;font-size:12px;"><tr style="background:#f0f0f0;"><th style="padding:4px 8px;">標的</th><th>動能</th><th>P&L</th><th>趨勢</th><th>距高</th></tr>{def_rows}</table>' if def_rows else '<p style="font-size:12px;color:#6c757d;">（目前持倉無明顯弱勢標的）</p>'
-            triple_html = f'<div style="background:#f8d7da;padding:12px 16px;border-radius:6px;margin:10px 0;border-left:4px solid #dc3545;"><strong>🚨 三重警告：市場環境不利於新增部位</strong><ul style="margin:6px 0 8px;">{cond_items}</ul><p style="margin:4px 0;font-size:12px;">建議：優先守住現有部位，暫緩新 ADD。</p>{def_table}</div>'
+            triple_html = f'<div style="background:#f8d7da;padding:12px 16px;border-radius:6px;margin:10px 0;border-left:4px solid {COLOR_LOSS};"><strong>🚨 三重警告：市場環境不利於新增部位</strong><ul style="margin:6px 0 8px;">{cond_items}</ul><p style="margin:4px 0;font-size:12px;">建議：優先守住現有部位，暫緩新 ADD。</p>{def_table}</div>'
 
         # Actions 分類
         exits = [a for a in actions if a["action"] == "EXIT"]
@@ -186,15 +329,15 @@ class GmailNotifier:
             rows = ""
             for a in exits:
                 pnl = a.get("pnl_pct", 0)
-                pnl_color = "#28a745" if pnl and pnl >= 0 else "#dc3545"
+                pnl_color = _pnl_color(pnl, zero_is_gain=False)
                 tranche_str = f" 第{a['tranche_n']}批" if a.get("tranche_n") else ""
                 rows += f'<tr style="background:#fdf2f2;"><td style="padding:5px 8px;font-weight:bold;">{a["symbol"]}{tranche_str}</td><td style="padding:5px 8px;">{a.get("shares", 0)} 股</td><td style="padding:5px 8px;color:{pnl_color};">{pnl:+.1f}%</td><td style="padding:5px 8px;font-size:11px;color:#666;">{a.get("reason", "")[:60]}</td></tr>'
-            exit_html = f'<h3 style="color:#dc3545;margin:14px 0 5px;">⛔ EXIT ({len(exits)} 筆)</h3><table style="border-collapse:collapse;width:100%;font-size:12px;"><tr style="background:#f0f0f0;"><th style="padding:5px 8px;text-align:left;">標的</th><th>股數</th><th>P&amp;L</th><th style="text-align:left;">原因</th></tr>{rows}</table>'
+            exit_html = f'<h3 style="color:{COLOR_LOSS};margin:14px 0 5px;">⛔ EXIT ({len(exits)} 筆)</h3><table style="border-collapse:collapse;width:100%;font-size:12px;"><tr style="background:#f0f0f0;"><th style="padding:5px 8px;text-align:left;">標的</th><th>股數</th><th>P&amp;L</th><th style="text-align:left;">原因</th></tr>{rows}</table>'
             if wc_exits:
                 stop_rows = "".join(
                     f'<tr><td style="padding:4px 8px;font-weight:bold;">{a["symbol"]}</td>'
-                    f'<td style="padding:4px 8px;font-family:monospace;color:#dc3545;">${a["wc_stop_px"]:.2f}</td>'
-                    f'<td style="padding:4px 8px;font-family:monospace;color:#28a745;">${a.get("wc_rebound_px", 0):.2f}</td>'
+                    f'<td style="padding:4px 8px;font-family:monospace;color:{COLOR_LOSS};">${a["wc_stop_px"]:.2f}</td>'
+                    f'<td style="padding:4px 8px;font-family:monospace;color:{COLOR_GAIN};">${a.get("wc_rebound_px", 0):.2f}</td>'
                     f'<td style="padding:4px 8px;font-size:11px;color:#666;">低點 ${a.get("wc_exit_low",0):.2f} × 110%</td></tr>'
                     for a in wc_exits if a.get("wc_stop_px")
                 )
@@ -202,7 +345,7 @@ class GmailNotifier:
                     f'<div style="background:#fff8e1;border-left:4px solid #ffc107;padding:8px 12px;margin-top:8px;border-radius:0 4px 4px 0;">'
                     f'<strong>📌 特殊池出場參考價</strong><br>'
                     f'<table style="border-collapse:collapse;font-size:12px;margin-top:4px;">'
-                    f'<tr style="background:#ffeeba;"><th style="padding:3px 8px;text-align:left;">標的</th><th style="padding:3px 8px;text-align:left;">🔴 止損觸發價</th><th style="padding:3px 8px;text-align:left;">🟢 反彈取消線</th><th style="padding:3px 8px;text-align:left;">計算基礎</th></tr>'
+                    f'<tr style="background:#ffeeba;"><th style="padding:3px 8px;text-align:left;">標的</th><th style="padding:3px 8px;text-align:left;">{RED_DOT} 止損觸發價</th><th style="padding:3px 8px;text-align:left;">{GREEN_DOT} 反彈取消線</th><th style="padding:3px 8px;text-align:left;">計算基礎</th></tr>'
                     f'{stop_rows}</table>'
                     f'<span style="font-size:11px;color:#856404;">開盤 &gt; 反彈取消線 → 出場窗口已過，Hold住<br>開盤 &lt; 止損觸發價 → EXIT 訊號有效，執行賣出</span>'
                     f'</div>'
@@ -213,8 +356,8 @@ class GmailNotifier:
         if rotates:
             rows = ""
             for a in rotates:
-                rows += f'<tr><td style="padding:5px 8px;color:#dc3545;font-weight:bold;">{a["sell_symbol"]}</td><td style="padding:5px 8px;">→</td><td style="padding:5px 8px;color:#28a745;font-weight:bold;">{a["buy_symbol"]}</td><td style="padding:5px 8px;font-size:11px;color:#666;">{a.get("reason", "")[:70]}</td></tr>'
-            rotate_html = f'<h3 style="color:#fd7e14;margin:14px 0 5px;">🔄 ROTATE ({len(rotates)} 組)</h3><table style="border-collapse:collapse;width:100%;font-size:12px;border-top:1px solid #eee;">{rows}</table>'
+                rows += f'<tr><td style="padding:5px 8px;color:{COLOR_LOSS};font-weight:bold;">{a["sell_symbol"]}</td><td style="padding:5px 8px;">→</td><td style="padding:5px 8px;color:{COLOR_GAIN};font-weight:bold;">{a["buy_symbol"]}</td><td style="padding:5px 8px;font-size:11px;color:#666;">{a.get("reason", "")[:70]}</td></tr>'
+            rotate_html = f'<h3 style="color:{COLOR_WARN};margin:14px 0 5px;">🔄 ROTATE ({len(rotates)} 組)</h3><table style="border-collapse:collapse;width:100%;font-size:12px;border-top:1px solid #eee;">{rows}</table>'
 
         # ADD 表
         add_html = ""
@@ -229,7 +372,7 @@ class GmailNotifier:
                 ml_prob = a.get("ml_prob")
                 ml_td = f'<td style="padding:5px 8px;font-size:11px;color:#0066cc;font-weight:bold;">{ml_prob*100:.0f}%</td>' if ml_prob is not None else '<td style="padding:5px 8px;"></td>'
                 rows += f'<tr style="background:#f0f7ff;"><td style="padding:5px 8px;font-weight:bold;">{a["symbol"]}</td><td style="padding:5px 8px;font-size:11px;color:#0066cc;">金字塔{direction} 第{a.get("tranche_n", 2)}批 {a.get("suggested_shares", 0)} 股</td>{ml_td}<td style="padding:5px 8px;font-size:11px;color:#666;">{a.get("reason", "")[:60]}</td></tr>'
-            add_html = f'<h3 style="color:#28a745;margin:14px 0 5px;">➕ ADD ({len(new_adds)} 新倉 + {len(pyramid_adds)} 金字塔)</h3><table style="border-collapse:collapse;width:100%;font-size:12px;border-top:1px solid #eee;"><tr style="background:#f0f0f0;"><th style="padding:5px 8px;text-align:left;">標的</th><th style="text-align:left;">股數/批次</th><th>ML%</th><th style="text-align:left;">原因</th></tr>{rows}</table>'
+            add_html = f'<h3 style="color:{COLOR_GAIN};margin:14px 0 5px;">➕ ADD ({len(new_adds)} 新倉 + {len(pyramid_adds)} 金字塔)</h3><table style="border-collapse:collapse;width:100%;font-size:12px;border-top:1px solid #eee;"><tr style="background:#f0f0f0;"><th style="padding:5px 8px;text-align:left;">標的</th><th style="text-align:left;">股數/批次</th><th>ML%</th><th style="text-align:left;">原因</th></tr>{rows}</table>'
 
         hold_html = f'<p style="margin:10px 0;font-size:12px;color:#6c757d;">✅ HOLD: {len(holds)} 檔（詳見附件 PDF）</p>'
 
@@ -247,42 +390,34 @@ class GmailNotifier:
             for a in tw_adds[:5]:
                 tw_rows += (f'<tr><td style="padding:3px 8px;font-weight:bold;">{a["symbol"]}</td>'
                             f'<td style="padding:3px 8px;">{a.get("name","")}</td>'
-                            f'<td style="padding:3px 8px;color:#28a745;">{a["momentum"]:+.1f}%</td>'
+                            f'<td style="padding:3px 8px;color:{COLOR_GAIN};">{a["momentum"]:+.1f}%</td>'
                             f'<td style="padding:3px 8px;">{a.get("trend_state","")}</td>'
                             f'<td style="padding:3px 8px;">{a.get("suggested_shares",0)} 股 @ NT${a["current_price"]:.0f}</td></tr>')
-            exit_str = f'  <span style="color:#dc3545;">⛔ EXIT {len(tw_exits)} 筆</span>' if tw_exits else ""
+            exit_str = f'  <span style="color:{COLOR_LOSS};">⛔ EXIT {len(tw_exits)} 筆</span>' if tw_exits else ""
             tw_section_html = (
                 f'<div style="background:#f0f7ff;padding:10px 14px;border-radius:6px;margin:12px 0;border-left:4px solid #0d6efd;">'
-                f'<strong>🇹🇼 台股部位</strong> &nbsp; 現金 {cash_str} &nbsp;|&nbsp; 合計 {total_str}{exit_str}'
+                f'<strong>{TW_FLAG} 台股部位</strong> &nbsp; 現金 {cash_str} &nbsp;|&nbsp; 合計 {total_str}{exit_str}'
                 + (f'<table style="border-collapse:collapse;width:100%;font-size:12px;margin-top:6px;"><tr style="background:#dce9ff;"><th style="padding:3px 8px;text-align:left;">代碼</th><th style="text-align:left;">名稱</th><th>動能</th><th style="text-align:left;">趨勢</th><th style="text-align:left;">建議</th></tr>{tw_rows}</table>' if tw_rows else '<p style="margin:4px 0;font-size:12px;color:#6c757d;">（尚無持倉，ADD 建議詳見 PDF）</p>')
                 + '</div>'
             )
 
-        return f'''<html>
-<body style="font-family:Arial,sans-serif;max-width:620px;margin:0 auto;padding:20px;color:#333;">
-  <h2 style="margin-bottom:4px;">盤前報告 {data["date"]}</h2>
-  <p style="color:#6c757d;margin:0 0 12px;font-size:12px;">版本 {data.get("version", "N/A")} &nbsp;|&nbsp; {regime_str}</p>
-
-  <div style="background:#f8f9fa;padding:12px 16px;border-radius:6px;margin-bottom:12px;font-size:13px;">
-    <strong>投組總值: ${portfolio.get("total_value", 0):,.0f}</strong>
-    &nbsp;&nbsp; 現金: ${portfolio.get("cash", 0):,.0f}
-    &nbsp;&nbsp; 個股: {portfolio.get("individual_count", 0)}/30{yearly_str}
-  </div>
-
-  {sector_html}
-  {menv_html}
-  {triple_html}
-  {exit_html}
-  {rotate_html}
-  {add_html}
-  {hold_html}
-  {tw_section_html}
-
-  <p style="color:#aaa;font-size:11px;margin-top:20px;">📎 完整持倉表、建議詳情請見附件 PDF</p>
-  <hr style="border:none;border-top:1px solid #eee;margin:12px 0;">
-  <p style="color:#ccc;font-size:10px;">此郵件由盤前建議系統自動發送</p>
-</body>
-</html>'''
+        return _SUMMARY_HTML_SKELETON.format_map({
+            "date": data["date"],
+            "version": data.get("version", "N/A"),
+            "regime_str": regime_str,
+            "total_value": portfolio.get("total_value", 0),
+            "cash": portfolio.get("cash", 0),
+            "individual_count": portfolio.get("individual_count", 0),
+            "yearly_str": yearly_str,
+            "sector_html": sector_html,
+            "menv_html": menv_html,
+            "triple_html": triple_html,
+            "exit_html": exit_html,
+            "rotate_html": rotate_html,
+            "add_html": add_html,
+            "hold_html": hold_html,
+            "tw_section_html": tw_section_html,
+        })
 
     def _format_text_report(self, data):
         """產生純文字報告"""
@@ -305,10 +440,10 @@ class GmailNotifier:
         if regime:
             if regime.get("is_bull", True):
                 pct = f"+{regime['pct_vs_ma200']:.1f}%" if regime.get("pct_vs_ma200") is not None else ""
-                lines.append(f"市場體制: 🟢 BULL  SPY ${regime.get('spy_price')} > MA200 ${regime.get('ma200')} ({pct})")
+                lines.append(f"市場體制: {GREEN_DOT} BULL  SPY ${regime.get('spy_price')} > MA200 ${regime.get('ma200')} ({pct})")
             else:
                 pct = f"{regime['pct_vs_ma200']:.1f}%" if regime.get("pct_vs_ma200") is not None else ""
-                lines.append(f"市場體制: 🔴 BEAR  SPY ${regime.get('spy_price')} < MA200 ${regime.get('ma200')} ({pct})")
+                lines.append(f"市場體制: {RED_DOT} BEAR  SPY ${regime.get('spy_price')} < MA200 ${regime.get('ma200')} ({pct})")
                 lines.append("  ⚠️  ADD / ROTATE 已暫停，等 SPY 站回 MA200")
         lines.append("")
 
@@ -351,9 +486,11 @@ class GmailNotifier:
         if exits:
             lines.append(f"EXIT 建議 ({len(exits)} 筆):")
             for a in exits:
-                pnl = f"{a.get('pnl_pct', 0):+.1f}%" if a.get("pnl_pct") is not None else "N/A"
-                tranche_str = f" 第{a['tranche_n']}批" if a.get("tranche_n") else ""
-                lines.append(f"  {a['symbol']:<6}{tranche_str} {a.get('shares', 0):>4} 股  {pnl:<8} {a.get('reason', '')}")
+                pnl = a.get("pnl_pct")
+                tranche_n = a.get("tranche_n")
+                pnl_str = f"{pnl:+.1f}%" if pnl is not None else "N/A"
+                tranche_str = f" 第{tranche_n}批" if tranche_n else ""
+                lines.append(f"  {a['symbol']:<6}{tranche_str} {a.get('shares', 0):>4} 股  {pnl_str:<8} {a.get('reason', '')}")
             lines.append("")
 
         if holds:
@@ -373,46 +510,49 @@ class GmailNotifier:
         if new_adds or pyramid_adds or backup_adds:
             lines.append(f"ADD 建議 ({len(new_adds)} 新倉 + {len(pyramid_adds)} 金字塔 + {len(backup_adds)} 備選):")
             for a in new_adds:
-                momentum = f"+{a.get('momentum', 0):.1f}%" if a.get("momentum") else ""
+                momentum = a.get("momentum")
                 rank = a.get("momentum_rank", "?")
                 shares = a.get("suggested_shares", 0)
+                rsi = a.get("rsi")
+                alpha_1y = a.get("alpha_1y")
+                alpha_3y = a.get("alpha_3y")
+                sector = a.get("sector")
+                ml_prob = a.get("ml_prob")
 
+                momentum_str = f"+{momentum:.1f}%" if momentum else ""
                 rsi_str = ""
-                rsi = a.get("rsi")
                 if rsi is not None and rsi > 80:
-                    rsi_str = f"  🔴 RSI {rsi:.0f}"
+                    rsi_str = f"  {RED_DOT} RSI {rsi:.0f}"
                 elif rsi is not None and rsi > 75:
-                    rsi_str = f"  🟡 RSI {rsi:.0f}"
+                    rsi_str = f"  {YELLOW_DOT} RSI {rsi:.0f}"
 
                 alpha_str = ""
-                alpha_1y = a.get("alpha_1y")
                 if alpha_1y is not None:
-                    alpha_emoji = "🟢" if alpha_1y > 0 else ("🟡" if alpha_1y > -20 else "🔴")
+                    alpha_emoji = _alpha_emoji(alpha_1y)
                     alpha_str = f"  1Y: {alpha_1y:+.0f}% {alpha_emoji}"
-                alpha_3y = a.get("alpha_3y")
                 if alpha_3y is not None:
-                    alpha_3y_emoji = "🟢" if alpha_3y > 0 else ("🟡" if alpha_3y > -20 else "🔴")
+                    alpha_3y_emoji = _alpha_emoji(alpha_3y)
                     alpha_str += f"  3Y: {alpha_3y:+.0f}% {alpha_3y_emoji}"
 
                 shares_str = str(shares)
                 post_rotate = a.get("suggested_shares_post_rotate")
                 if post_rotate is not None and post_rotate != shares:
                     shares_str += f" (ROTATE後 {post_rotate} 股)"
-                sector_tag = f"[{a['sector']}]" if a.get('sector') else ""
-                ml_prob = a.get("ml_prob")
+                sector_tag = f"[{sector}]" if sector else ""
                 ml_str = f"  ML: {ml_prob*100:.0f}%" if ml_prob is not None else ""
-                lines.append(f"  #{rank} {a['symbol']}{sector_tag}  建議 {shares_str} @ ${a.get('current_price', 0):.2f}  {momentum}{rsi_str}{alpha_str}{ml_str}")
+                lines.append(f"  #{rank} {a['symbol']}{sector_tag}  建議 {shares_str} @ ${a.get('current_price', 0):.2f}  {momentum_str}{rsi_str}{alpha_str}{ml_str}")
                 shap_top = a.get("ml_shap_top", [])
                 if shap_top:
                     shap_parts = [f"{arrow}{label}" for label, sv, arrow in shap_top]
                     lines.append(f"       ML因素: {' | '.join(shap_parts)}")
             for a in pyramid_adds:
-                momentum = f"+{a.get('momentum', 0):.1f}%"
-                direction_arrow = "↑" if a.get("direction") == "up" else "↓"
-                alpha_str = f"  1Y: {a['alpha_1y']:+.0f}%" if a.get("alpha_1y") is not None else ""
+                alpha_1y = a.get("alpha_1y")
                 ml_prob = a.get("ml_prob")
+                momentum_str = f"+{a.get('momentum', 0):.1f}%"
+                direction_arrow = "↑" if a.get("direction") == "up" else "↓"
+                alpha_str = f"  1Y: {alpha_1y:+.0f}%" if alpha_1y is not None else ""
                 ml_str = f"  ML: {ml_prob*100:.0f}%" if ml_prob is not None else ""
-                lines.append(f"  [{direction_arrow}第{a['tranche_n']}批] {a['symbol']}  +{a.get('suggested_shares', 0)} 股 @ ${a.get('current_price', 0):.2f}  {momentum}{alpha_str}{ml_str}")
+                lines.append(f"  [{direction_arrow}第{a['tranche_n']}批] {a['symbol']}  +{a.get('suggested_shares', 0)} 股 @ ${a.get('current_price', 0):.2f}  {momentum_str}{alpha_str}{ml_str}")
                 shap_top = a.get("ml_shap_top", [])
                 if shap_top:
                     shap_parts = [f"{arrow}{label}" for label, sv, arrow in shap_top]
@@ -420,18 +560,20 @@ class GmailNotifier:
             if backup_adds:
                 lines.append("  [備選 — 可替換 1Y/3Y alpha 差的主要候選]")
                 for a in backup_adds:
-                    momentum = f"+{a.get('momentum', 0):.1f}%" if a.get("momentum") else ""
+                    momentum = a.get("momentum")
                     alpha_1y = a.get("alpha_1y")
                     alpha_3y = a.get("alpha_3y")
+                    sector = a.get("sector")
+                    momentum_str = f"+{momentum:.1f}%" if momentum else ""
                     alpha_str = ""
                     if alpha_1y is not None:
-                        alpha_emoji = "🟢" if alpha_1y > 0 else ("🟡" if alpha_1y > -20 else "🔴")
+                        alpha_emoji = _alpha_emoji(alpha_1y)
                         alpha_str = f"  1Y: {alpha_1y:+.0f}% {alpha_emoji}"
                     if alpha_3y is not None:
-                        alpha_3y_emoji = "🟢" if alpha_3y > 0 else ("🟡" if alpha_3y > -20 else "🔴")
+                        alpha_3y_emoji = _alpha_emoji(alpha_3y)
                         alpha_str += f"  3Y: {alpha_3y:+.0f}% {alpha_3y_emoji}"
-                    sector_tag = f"[{a['sector']}]" if a.get('sector') else ""
-                    lines.append(f"  [備#{a.get('momentum_rank', '?')}] {a['symbol']}{sector_tag}  @ ${a.get('current_price', 0):.2f}  {momentum}{alpha_str}")
+                    sector_tag = f"[{sector}]" if sector else ""
+                    lines.append(f"  [備#{a.get('momentum_rank', '?')}] {a['symbol']}{sector_tag}  @ ${a.get('current_price', 0):.2f}  {momentum_str}{alpha_str}")
             lines.append("")
 
         # ROTATE 建議（汰弱留強）
@@ -439,19 +581,22 @@ class GmailNotifier:
         if rotates:
             lines.append(f"ROTATE 建議（汰弱留強）({len(rotates)} 組):")
             for a in rotates:
-                sell_pnl = f"{a.get('sell_pnl_pct', 0):+.1f}%" if a.get("sell_pnl_pct") is not None else "N/A"
+                sell_pnl = a.get("sell_pnl_pct")
                 buy_alpha_1y = a.get("buy_alpha_1y")
                 buy_alpha_3y = a.get("buy_alpha_3y")
+                sell_sector = a.get("sell_sector")
+                buy_sector = a.get("buy_sector")
+                sell_pnl_str = f"{sell_pnl:+.1f}%" if sell_pnl is not None else "N/A"
                 alpha_str = ""
                 if buy_alpha_1y is not None:
-                    alpha_emoji = "🟢" if buy_alpha_1y > 0 else ("🟡" if buy_alpha_1y > -20 else "🔴")
+                    alpha_emoji = _alpha_emoji(buy_alpha_1y)
                     alpha_str = f"1Y: {buy_alpha_1y:+.0f}% {alpha_emoji}"
                 if buy_alpha_3y is not None:
-                    alpha_3y_emoji = "🟢" if buy_alpha_3y > 0 else ("🟡" if buy_alpha_3y > -20 else "🔴")
+                    alpha_3y_emoji = _alpha_emoji(buy_alpha_3y)
                     alpha_str += f"  3Y: {buy_alpha_3y:+.0f}% {alpha_3y_emoji}"
-                sell_sector_tag = f"[{a['sell_sector']}]" if a.get('sell_sector') else ""
-                buy_sector_tag = f"[{a['buy_sector']}]" if a.get('buy_sector') else ""
-                lines.append(f"  賣 {a['sell_symbol']}{sell_sector_tag}  {a['sell_shares']} 股 (動能: {a['sell_momentum']:+.1f}%, P&L: {sell_pnl})")
+                sell_sector_tag = f"[{sell_sector}]" if sell_sector else ""
+                buy_sector_tag = f"[{buy_sector}]" if buy_sector else ""
+                lines.append(f"  賣 {a['sell_symbol']}{sell_sector_tag}  {a['sell_shares']} 股 (動能: {a['sell_momentum']:+.1f}%, P&L: {sell_pnl_str})")
                 lines.append(f"  → 買 {a['buy_symbol']}{buy_sector_tag}  {a['buy_shares']} 股 (動能: +{a['buy_momentum']:.1f}%, {alpha_str})")
                 lines.append(f"     {a.get('reason', '')}")
                 lines.append("")
@@ -459,7 +604,7 @@ class GmailNotifier:
         # 需注意
         watch_lines = []
         # 1. 動能轉弱持倉
-        weak = [a for a in holds if a.get("momentum") is not None and a.get("momentum") < 0]
+        weak = [a for a in holds if (a.get("momentum") or 0) < 0]
         for a in sorted(weak, key=lambda x: x["momentum"]):
             ts = a.get("trend_state", {})
             trend = ts.get("state", "") if ts else ""
@@ -468,7 +613,7 @@ class GmailNotifier:
         losing = [a for a in holds if a.get("pnl_pct") is not None and a["pnl_pct"] < -3 and (a.get("momentum") or 0) >= 0]
         for a in sorted(losing, key=lambda x: x["pnl_pct"]):
             stop_price = round(a["avg_price"] * 0.85, 2)
-            watch_lines.append(f"  🔴 {a['symbol']:<6} P&L {a['pnl_pct']:+.1f}%  停損線 ${stop_price:.2f}")
+            watch_lines.append(f"  {RED_DOT} {a['symbol']:<6} P&L {a['pnl_pct']:+.1f}%  停損線 ${stop_price:.2f}")
         # 3. ROTATE 目標 1Y Alpha 差
         bad_rotates = [a for a in rotates if a.get("buy_alpha_1y") is not None and a["buy_alpha_1y"] < -20]
         for a in bad_rotates:
@@ -487,7 +632,7 @@ class GmailNotifier:
             tw_adds  = [a for a in tw_actions_list if a["action"] == "TW_ADD"]
             cash_ntd  = tw_cash_val or 0
             total_ntd = tw_total_val or 0
-            lines.append(f"🇹🇼 台股部位:")
+            lines.append(f"{TW_FLAG} 台股部位:")
             lines.append(f"  現金: NT${cash_ntd:,.0f}  合計: NT${total_ntd:,.0f}")
             if tw_exits:
                 lines.append(f"  EXIT ({len(tw_exits)} 筆):")
@@ -503,7 +648,7 @@ class GmailNotifier:
         tw_stocks = data.get("tw_stocks", {})
         if tw_stocks:
             scan_count = tw_stocks.get("scan_count", 0)
-            lines.append(f"🇹🇼 台股觀察（{scan_count} 檔高流動性股）:")
+            lines.append(f"{TW_FLAG} 台股觀察（{scan_count} 檔高流動性股）:")
             leaders = tw_stocks.get("leaders", [])
             if leaders:
                 lines.append("  動能領先:")
@@ -511,7 +656,7 @@ class GmailNotifier:
                     alpha = t.get("alpha_1y")
                     alpha_str = ""
                     if alpha is not None:
-                        alpha_emoji = "🟢" if alpha > 0 else ("🟡" if alpha > -10 else "🔴")
+                        alpha_emoji = _alpha_emoji(alpha, _TW_ALPHA_THRESHOLDS)
                         alpha_str = f"  1Y: {alpha:+.0f}% {alpha_emoji}"
                     lines.append(f"    #{t['rank']} {t['symbol']} {t.get('name', '')} +{t['momentum']:.1f}%{alpha_str}")
 
@@ -525,37 +670,49 @@ class GmailNotifier:
         return "\n".join(lines)
 
     def _format_html_report(self, data):
-        """產生 HTML 報告"""
+        """產生 HTML 報告（各區塊直接寫入 out，最後 join 一次）"""
         portfolio = data.get("portfolio_snapshot", {})
         sector = data.get("sector_status", {})
         actions = data.get("actions", [])
 
+        out = []
+        append = out.append
+
+        # 標頭 + 投組摘要
+        append(_REPORT_HTML_HEAD.format_map({
+            "date": data["date"],
+            "version": data.get("version", "N/A"),
+            "total_value": portfolio.get("total_value", 0),
+            "cash": portfolio.get("cash", 0),
+            "individual_count": portfolio.get("individual_count", 0),
+        }))
+
         # 年度 P&L
-        yearly_html = ""
         yearly = portfolio.get("yearly_pnl")
         if yearly:
             sign = "+" if yearly["pnl_amount"] >= 0 else ""
-            color = "#28a745" if yearly["pnl_amount"] >= 0 else "#dc3545"
-            yearly_html = f'<tr><td>年度 P&L</td><td style="color:{color}">{sign}${yearly["pnl_amount"]:,.2f} ({sign}{yearly["pnl_pct"]:.1f}%)</td></tr>'
+            color = _pnl_color(yearly["pnl_amount"])
+            append(f'<tr><td>年度 P&L</td><td style="color:{color}">{sign}${yearly["pnl_amount"]:,.2f} ({sign}{yearly["pnl_pct"]:.1f}%)</td></tr>')
+        append('''
+            </table>
+''')
 
         # 市場體制橫幅
         regime = data.get("regime_status", {})
-        regime_html = ""
         if regime:
             if regime.get("is_bull", True):
                 pct = f"+{regime['pct_vs_ma200']:.1f}%" if regime.get("pct_vs_ma200") is not None else ""
-                regime_html = f'<div style="background:#d4edda;padding:10px;border-radius:5px;margin:10px 0;border-left:4px solid #28a745;"><strong>🟢 市場體制: BULL</strong> &nbsp; SPY ${regime.get("spy_price")} &gt; MA200 ${regime.get("ma200")} ({pct})</div>'
+                append(f'<div style="background:#d4edda;padding:10px;border-radius:5px;margin:10px 0;border-left:4px solid {COLOR_GAIN};"><strong>{GREEN_DOT} 市場體制: BULL</strong> &nbsp; SPY ${regime.get("spy_price")} &gt; MA200 ${regime.get("ma200")} ({pct})</div>')
             else:
                 pct = f"{regime['pct_vs_ma200']:.1f}%" if regime.get("pct_vs_ma200") is not None else ""
-                regime_html = f'<div style="background:#f8d7da;padding:10px;border-radius:5px;margin:10px 0;border-left:4px solid #dc3545;"><strong>🔴 市場體制: BEAR</strong> &nbsp; SPY ${regime.get("spy_price")} &lt; MA200 ${regime.get("ma200")} ({pct})<br><span style="color:#721c24;">⚠️ ADD / ROTATE 已暫停，等 SPY 站回 MA200 再開放新倉</span></div>'
+                append(f'<div style="background:#f8d7da;padding:10px;border-radius:5px;margin:10px 0;border-left:4px solid {COLOR_LOSS};"><strong>{RED_DOT} 市場體制: BEAR</strong> &nbsp; SPY ${regime.get("spy_price")} &lt; MA200 ${regime.get("ma200")} ({pct})<br><span style="color:#721c24;">⚠️ ADD / ROTATE 已暫停，等 SPY 站回 MA200 再開放新倉</span></div>')
 
         # 市場環境（VIX + 石油）
         menv = data.get("market_env", {})
-        menv_html_full = ""
         if menv.get("regime_label"):
             emoji = menv.get("regime_emoji", "")
-            regime_color = "#dc3545" if emoji == "🔴" else ("#fd7e14" if emoji == "🟠" else "#28a745")
-            bg_color = "#f8d7da" if emoji == "🔴" else ("#fff3cd" if emoji == "🟡" else "#d4edda")
+            regime_color = COLOR_LOSS if emoji == RED_DOT else (COLOR_WARN if emoji == ORANGE_DOT else COLOR_GAIN)
+            bg_color = "#f8d7da" if emoji == RED_DOT else ("#fff3cd" if emoji == YELLOW_DOT else "#d4edda")
             border_color = regime_color
             lines_env = []
             if menv.get("vix_level") is not None:
@@ -572,40 +729,57 @@ class GmailNotifier:
             if menv.get("regime_note"):
                 note_str = f'<br><span style="font-size:11px;color:#555;">{menv["regime_note"].replace(chr(10), "<br>")}</span>'
             detail_str = "  &nbsp;  ".join(lines_env)
-            menv_html_full = f'<div style="background:{bg_color};padding:10px;border-radius:5px;margin:10px 0;border-left:4px solid {border_color};"><strong>{emoji} 市場環境: {menv["regime_label"]}</strong> &nbsp; {detail_str}{note_str}</div>'
+            append(f'<div style="background:{bg_color};padding:10px;border-radius:5px;margin:10px 0;border-left:4px solid {border_color};"><strong>{emoji} 市場環境: {menv["regime_label"]}</strong> &nbsp; {detail_str}{note_str}</div>')
 
         # 三重警告（完整 HTML 版）
         triple = data.get("triple_warning", {})
-        triple_html_full = ""
         if triple.get("triggered"):
             cond_items = "".join(f"<li>⚠️ {c}</li>" for c in triple.get("conditions", []))
-            def_rows = ""
-            for d in triple.get("defensive_candidates", []):
-                mom_str  = f"{d['momentum']:+.1f}%" if d.get("momentum") is not None else "—"
-                pnl_str  = f"{d['pnl_pct']:+.1f}%" if d.get("pnl_pct") is not None else "—"
-                ts_state = (d.get("trend_state") or {}).get("state", "")
-                ts_str   = "↘️轉弱" if ts_state == "轉弱" else ("→" if ts_state == "盤整" else "")
-                fh_str   = f"{d['from_high_pct']:+.0f}%" if d.get("from_high_pct") is not None else "—"
-                def_rows += f'<tr><td style="padding:5px 8px;font-weight:bold;">{d["symbol"]}</td><td style="padding:5px 8px;color:#dc3545;">{mom_str}</td><td style="padding:5px 8px;">{pnl_str}</td><td style="padding:5px 8px;">{ts_str}</td><td style="padding:5px 8px;">{fh_str}</td></tr>'
-            def_table = ""
-            if def_rows:
-                def_table = f'<p style="margin:8px 0 4px;"><strong>防禦性減倉候選（動能轉負，尚未觸停損）：</strong></p><table style="border-collapse:collapse;width:auto;font-size:12px;"><tr style="background:#f0f0f0;"><th style="padding:5px 8px;">標的</th><th>動能</th><th>P&L</th><th>趨勢</th><th>距高</th></tr>{def_rows}</table>'
-            triple_html_full = f'<div style="background:#f8d7da;padding:12px;border-radius:5px;margin:10px 0;border-left:4px solid #dc3545;"><strong>🚨 三重警告：市場環境不利於新增部位</strong><ul style="margin:6px 0;">{cond_items}</ul><p style="margin:4px 0;font-size:12px;">建議：優先守住現有部位，暫緩新 ADD。</p>{def_table}</div>'
+            append(f'<div style="background:#f8d7da;padding:12px;border-radius:5px;margin:10px 0;border-left:4px solid {COLOR_LOSS};"><strong>🚨 三重警告：市場環境不利於新增部位</strong><ul style="margin:6px 0;">{cond_items}</ul><p style="margin:4px 0;font-size:12px;">建議：優先守住現有部位，暫緩新 ADD。</p>')
+            defensive = triple.get("defensive_candidates", [])
+            if defensive:
+                append('<p style="margin:8px 0 4px;"><strong>防禦性減倉候選（動能轉負，尚未觸停損）：</strong></p><table style="border-collapse:collapse;width:auto;font-size:12px;"><tr style="background:#f0f0f0;"><th style="padding:5px 8px;">標的</th><th>動能</th><th>P&L</th><th>趨勢</th><th>距高</th></tr>')
+                for d in defensive:
+                    mom_str  = f"{d['momentum']:+.1f}%" if d.get("momentum") is not None else "—"
+                    pnl_str  = f"{d['pnl_pct']:+.1f}%" if d.get("pnl_pct") is not None else "—"
+                    ts_state = (d.get("trend_state") or {}).get("state", "")
+                    ts_str   = "↘️轉弱" if ts_state == "轉弱" else ("→" if ts_state == "盤整" else "")
+                    fh_str   = f"{d['from_high_pct']:+.0f}%" if d.get("from_high_pct") is not None else "—"
+                    append(f'<tr><td style="padding:5px 8px;font-weight:bold;">{d["symbol"]}</td><td style="padding:5px 8px;color:{COLOR_LOSS};">{mom_str}</td><td style="padding:5px 8px;">{pnl_str}</td><td style="padding:5px 8px;">{ts_str}</td><td style="padding:5px 8px;">{fh_str}</td></tr>')
+                append('</table>')
+            append('</div>')
 
         # 板塊警告
-        alerts_html = ""
         if sector.get("alerts"):
             alert_items = "".join(f"<li>{a}</li>" for a in sector["alerts"])
-            alerts_html = f'<div style="background:#fff3cd;padding:10px;border-radius:5px;margin:10px 0;"><strong>板塊警告</strong><ul style="margin:5px 0;">{alert_items}</ul></div>'
+            append(f'<div style="background:#fff3cd;padding:10px;border-radius:5px;margin:10px 0;"><strong>板塊警告</strong><ul style="margin:5px 0;">{alert_items}</ul></div>')
 
-        # Actions 表格
+        # Actions 分類
         exits = [a for a in actions if a["action"] == "EXIT"]
         holds = [a for a in actions if a["action"] == "HOLD"]
         new_adds = [a for a in actions if a["action"] == "ADD" and not a.get("is_backup") and not a.get("is_pyramid")]
         pyramid_adds = [a for a in actions if a["action"] == "ADD" and a.get("is_pyramid")]
         backup_adds = [a for a in actions if a["action"] == "ADD" and a.get("is_backup")]
-        adds = new_adds
-        rotates_sell = {a["sell_symbol"] for a in actions if a["action"] == "ROTATE"}
+        rotates = [a for a in actions if a["action"] == "ROTATE"]
+        rotates_sell = {a["sell_symbol"] for a in rotates}
+
+        # 需注意
+        watch_items = []
+        weak = [a for a in holds if (a.get("momentum") or 0) < 0]
+        for a in sorted(weak, key=lambda x: x["momentum"]):
+            ts = a.get("trend_state") or {}
+            trend = ts.get("state", "")
+            watch_items.append(f'<li>⚠️ <strong>{a["symbol"]}</strong> 動能{a["momentum"]:+.1f}% {trend}，P&L: {a.get("pnl_pct", 0):+.1f}%</li>')
+        losing = [a for a in holds if (a.get("pnl_pct") or 0) < -3 and (a.get("momentum") or 0) >= 0]
+        for a in sorted(losing, key=lambda x: x.get("pnl_pct", 0)):
+            stop_price = round(a["avg_price"] * 0.85, 2)
+            watch_items.append(f'<li>{RED_DOT} <strong>{a["symbol"]}</strong> P&L {a.get("pnl_pct", 0):+.1f}%，停損線 ${stop_price:.2f}</li>')
+        for a in rotates:
+            if (a.get("buy_alpha_1y") or 0) < -20:
+                watch_items.append(f'<li>⚠️ ROTATE <strong>{a["sell_symbol"]}→{a["buy_symbol"]}</strong> 換股目標 1Y落後大盤 {a.get("buy_alpha_1y", 0):+.0f}%，建議謹慎</li>')
+        if watch_items:
+            items_str = "".join(watch_items)
+            append(f'<div style="background:#f8d7da;padding:12px;border-radius:5px;margin:10px 0;"><strong>需注意</strong><ul style="margin:5px 0;">{items_str}</ul></div>')
 
         # === 持倉總覽表 ===
         # 排序：EXIT 優先，再依動能升序（弱的在前），core 放最後
@@ -629,12 +803,29 @@ class GmailNotifier:
                 days_since = (datetime.date.today() - entry_date).days
                 days_left = params["protect"] - days_since
                 if days_left > 0:
-                    return f'<span style="color:#fd7e14;">保護{days_left}d</span>'
-                return '<span style="color:#28a745;">可出場</span>'
+                    return f'<span style="color:{COLOR_WARN};">保護{days_left}d</span>'
+                return f'<span style="color:{COLOR_GAIN};">可出場</span>'
             except Exception:
                 return "—"
 
-        portfolio_rows = ""
+        append('''
+        <h3 style="margin-top:20px;">📋 持倉總覽</h3>
+        <table style="border-collapse:collapse;width:100%;font-size:13px;">
+            <tr style="background:#343a40;color:#fff;">
+                <th style="padding:7px 8px;text-align:left;">標的</th>
+                <th style="padding:7px 8px;text-align:left;">板塊</th>
+                <th style="padding:7px 8px;">批次</th>
+                <th style="padding:7px 8px;">股數</th>
+                <th style="padding:7px 8px;">現價</th>
+                <th style="padding:7px 8px;">進場成本</th>
+                <th style="padding:7px 8px;">P&amp;L</th>
+                <th style="padding:7px 8px;">保護期</th>
+                <th style="padding:7px 8px;">距高</th>
+                <th style="padding:7px 8px;">動能</th>
+                <th style="padding:7px 8px;">趨勢</th>
+                <th style="padding:7px 8px;">建議</th>
+            </tr>
+''')
         for a in portfolio_rows_data:
             sym = a["symbol"]
             tranches = a.get("tranches") or []
@@ -652,25 +843,25 @@ class GmailNotifier:
             # 決定 Action 標籤
             if a["action"] == "EXIT":
                 tranche_str = f" 第{a.get('tranche_n')}批" if a.get("tranche_n") else ""
-                action_label = f'<span style="color:#dc3545;font-weight:bold;">⛔ EXIT{tranche_str}</span>'
+                action_label = f'<span style="color:{COLOR_LOSS};font-weight:bold;">⛔ EXIT{tranche_str}</span>'
             elif sym in rotates_sell:
-                action_label = '<span style="color:#fd7e14;font-weight:bold;">🔄 ROTATE</span>'
+                action_label = f'<span style="color:{COLOR_WARN};font-weight:bold;">🔄 ROTATE</span>'
             elif a.get("source") == "core_hold":
                 action_label = '<span style="color:#6c757d;">🔒 CORE</span>'
             else:
-                action_label = '<span style="color:#28a745;">✅ HOLD</span>'
+                action_label = f'<span style="color:{COLOR_GAIN};">✅ HOLD</span>'
 
             # 趨勢標籤
             if trend_state == "轉強":
-                trend_label = '<span style="color:#28a745;">↗️轉強</span>'
+                trend_label = f'<span style="color:{COLOR_GAIN};">↗️轉強</span>'
             elif trend_state == "轉弱":
-                trend_label = '<span style="color:#dc3545;">↘️轉弱</span>'
+                trend_label = f'<span style="color:{COLOR_LOSS};">↘️轉弱</span>'
             else:
                 trend_label = '<span style="color:#6c757d;">→盤整</span>' if trend_state == "盤整" else ""
 
             # 動能欄
             if momentum is not None:
-                m_color = "#28a745" if momentum > 0 else "#dc3545"
+                m_color = COLOR_GAIN if momentum > 0 else COLOR_LOSS
                 rank_str = f"#{rank} " if rank else ""
                 momentum_str = f'<span style="color:{m_color};">{rank_str}{momentum:+.1f}%</span>'
             else:
@@ -681,9 +872,9 @@ class GmailNotifier:
             if high_price and price and high_price > 0:
                 from_high = (price - high_price) / high_price * 100
                 if from_high <= -20:
-                    fh_color, fh_icon = "#dc3545", "🔴"
+                    fh_color, fh_icon = COLOR_LOSS, RED_DOT
                 elif from_high <= -10:
-                    fh_color, fh_icon = "#fd7e14", "🟡"
+                    fh_color, fh_icon = COLOR_WARN, YELLOW_DOT
                 else:
                     fh_color, fh_icon = "#6c757d", ""
                 from_high_str = f'<span style="color:{fh_color};">{fh_icon}{from_high:.0f}%</span>'
@@ -709,11 +900,11 @@ class GmailNotifier:
             if not tranches:
                 # EXIT 或無 tranches：沿用單行格式，保護期欄顯示 —
                 if pnl is not None:
-                    pnl_color = "#28a745" if pnl >= 0 else "#dc3545"
+                    pnl_color = _pnl_color(pnl)
                     pnl_str = f'<span style="color:{pnl_color};">{pnl:+.1f}%</span>'
                 else:
                     pnl_str = "—"
-                portfolio_rows += f'''<tr style="{row_bg}border-bottom:1px solid #eee;">
+                append(f'''<tr style="{row_bg}border-bottom:1px solid #eee;">
                     <td style="padding:6px 8px;font-weight:bold;">{sym}</td>
                     <td style="padding:6px 8px;font-size:11px;color:#6c757d;">{sector_str}</td>
                     <td style="padding:6px 8px;text-align:center;font-size:11px;">—</td>
@@ -726,7 +917,7 @@ class GmailNotifier:
                     <td style="padding:6px 8px;text-align:center;">{momentum_str}</td>
                     <td style="padding:6px 8px;text-align:center;">{trend_label}</td>
                     <td style="padding:6px 8px;text-align:center;">{action_label}</td>
-                </tr>'''
+                </tr>''')
             else:
                 # 有 tranches：每批次一行，標的/板塊/現價/距高/動能/趨勢/建議 用 rowspan
                 for i, t in enumerate(tranches):
@@ -738,7 +929,7 @@ class GmailNotifier:
                     # 批次 P&L（vs 該批進場成本）
                     if price and t_entry:
                         t_pnl = (price - t_entry) / t_entry * 100
-                        t_pnl_color = "#28a745" if t_pnl >= 0 else "#dc3545"
+                        t_pnl_color = _pnl_color(t_pnl)
                         t_pnl_str = f'<span style="color:{t_pnl_color};">{t_pnl:+.1f}%</span>'
                     else:
                         t_pnl_str = "—"
@@ -752,7 +943,7 @@ class GmailNotifier:
                     row_border = "border-bottom:2px solid #dee2e6;" if is_last else "border-bottom:1px solid #f0f0f0;"
 
                     if i == 0:
-                        portfolio_rows += f'''<tr style="{row_bg}{row_border}">
+                        append(f'''<tr style="{row_bg}{row_border}">
                             <td style="padding:6px 8px;font-weight:bold;" rowspan="{n_rows}">{sym}</td>
                             <td style="padding:6px 8px;font-size:11px;color:#6c757d;" rowspan="{n_rows}">{sector_str}</td>
                             <td style="padding:6px 8px;text-align:center;font-size:11px;">{batch_html}</td>
@@ -765,82 +956,62 @@ class GmailNotifier:
                             <td style="padding:6px 8px;text-align:center;" rowspan="{n_rows}">{momentum_str}</td>
                             <td style="padding:6px 8px;text-align:center;" rowspan="{n_rows}">{trend_label}</td>
                             <td style="padding:6px 8px;text-align:center;" rowspan="{n_rows}">{action_label}</td>
-                        </tr>'''
+                        </tr>''')
                     else:
-                        portfolio_rows += f'''<tr style="{row_bg}{row_border}">
+                        append(f'''<tr style="{row_bg}{row_border}">
                             <td style="padding:6px 8px;text-align:center;font-size:11px;">{batch_html}</td>
                             <td style="padding:6px 8px;text-align:center;">{t_shares}</td>
                             <td style="padding:6px 8px;text-align:right;">${t_entry:.2f}</td>
                             <td style="padding:6px 8px;text-align:right;">{t_pnl_str}</td>
                             <td style="padding:6px 8px;text-align:center;">{protect_html}</td>
-                        </tr>'''
-
-        portfolio_html = f'''
-        <h3 style="margin-top:20px;">📋 持倉總覽</h3>
-        <table style="border-collapse:collapse;width:100%;font-size:13px;">
-            <tr style="background:#343a40;color:#fff;">
-                <th style="padding:7px 8px;text-align:left;">標的</th>
-                <th style="padding:7px 8px;text-align:left;">板塊</th>
-                <th style="padding:7px 8px;">批次</th>
-                <th style="padding:7px 8px;">股數</th>
-                <th style="padding:7px 8px;">現價</th>
-                <th style="padding:7px 8px;">進場成本</th>
-                <th style="padding:7px 8px;">P&amp;L</th>
-                <th style="padding:7px 8px;">保護期</th>
-                <th style="padding:7px 8px;">距高</th>
-                <th style="padding:7px 8px;">動能</th>
-                <th style="padding:7px 8px;">趨勢</th>
-                <th style="padding:7px 8px;">建議</th>
-            </tr>
-            {portfolio_rows}
+                        </tr>''')
+        append(f'''
         </table>
         <p style="font-size:11px;color:#6c757d;margin:4px 0 0 0;">
-            🔴 EXIT &nbsp;|&nbsp; 🟠 ROTATE/動能負 &nbsp;|&nbsp; 🟡 接近停損 &nbsp;|&nbsp; 🟢 動能強+轉強 &nbsp;|&nbsp; 保護期=不觸發逐批停損
-        </p>'''
+            {RED_DOT} EXIT &nbsp;|&nbsp; {ORANGE_DOT} ROTATE/動能負 &nbsp;|&nbsp; {YELLOW_DOT} 接近停損 &nbsp;|&nbsp; {GREEN_DOT} 動能強+轉強 &nbsp;|&nbsp; 保護期=不觸發逐批停損
+        </p>''')
 
-        exits_html = ""
         if exits:
-            rows = ""
-            for a in exits:
-                pnl = a.get("pnl_pct", 0)
-                pnl_color = "#28a745" if pnl and pnl >= 0 else "#dc3545"
-                pnl_str = f"{pnl:+.1f}%" if pnl is not None else "N/A"
-                tranche_str = f" 第{a['tranche_n']}批" if a.get("tranche_n") else ""
-                rows += f'<tr><td>{a["symbol"]}{tranche_str}</td><td>{a.get("shares", 0)} 股</td><td style="color:{pnl_color}">{pnl_str}</td><td>{a.get("reason", "")}</td></tr>'
-            exits_html = f'''
+            append(f'''
             <div class="section-block">
-            <h3 style="color:#dc3545;">EXIT 建議 ({len(exits)} 筆)</h3>
+            <h3 style="color:{COLOR_LOSS};">EXIT 建議 ({len(exits)} 筆)</h3>
             <table style="border-collapse:collapse;width:100%;">
                 <tr style="background:#f8f9fa;"><th style="text-align:left;padding:8px;">標的</th><th>股數</th><th>P&L</th><th>原因</th></tr>
-                {rows}
+                ''')
+            for a in exits:
+                pnl = a.get("pnl_pct", 0)
+                tranche_n = a.get("tranche_n")
+                pnl_color = _pnl_color(pnl, zero_is_gain=False)
+                pnl_str = f"{pnl:+.1f}%" if pnl is not None else "N/A"
+                tranche_str = f" 第{tranche_n}批" if tranche_n else ""
+                append(f'<tr><td>{a["symbol"]}{tranche_str}</td><td>{a.get("shares", 0)} 股</td><td style="color:{pnl_color}">{pnl_str}</td><td>{a.get("reason", "")}</td></tr>')
+            append('''
             </table>
-            </div>'''
+            </div>''')
 
-        holds_html = ""
         if holds:
             hold_parts = []
             for a in holds:
                 ts = a.get("trend_state")
                 if ts and ts["state"] == "轉弱":
-                    hold_parts.append(f'<span style="color:#dc3545;">{a["symbol"]}↘️</span>')
+                    hold_parts.append(f'<span style="color:{COLOR_LOSS};">{a["symbol"]}↘️</span>')
                 elif ts and ts["state"] == "轉強":
-                    hold_parts.append(f'<span style="color:#28a745;">{a["symbol"]}↗️</span>')
+                    hold_parts.append(f'<span style="color:{COLOR_GAIN};">{a["symbol"]}↗️</span>')
                 else:
                     hold_parts.append(a["symbol"])
             symbols = ", ".join(hold_parts)
-            holds_html = f'<h3 style="color:#6c757d;">HOLD ({len(holds)} 檔)</h3><p>{symbols}</p>'
+            append(f'<h3 style="color:#6c757d;">HOLD ({len(holds)} 檔)</h3><p>{symbols}</p>')
 
-        adds_html = ""
         if new_adds or pyramid_adds or backup_adds:
 
             def _add_rsi_html(a):
                 rsi = a.get("rsi")
                 if rsi is not None and rsi > 80:
-                    return f'<td style="color:#dc3545;">🔴 {rsi:.0f}</td>'
+                    return f'<td style="color:{COLOR_LOSS};">{RED_DOT} {rsi:.0f}</td>'
                 if rsi is not None and rsi > 75:
-                    return f'<td style="color:#fd7e14;">🟡 {rsi:.0f}</td>'
+                    return f'<td style="color:{COLOR_WARN};">{YELLOW_DOT} {rsi:.0f}</td>'
                 if rsi is not None:
-                    return f'<td style="color:#28a745;">{rsi:.0f}</td>'
+                    return f'<td style="color:{COLOR_GAIN};">{rsi:.0f}</td>'
                 return "<td></td>"
 
             def _add_alpha_html(a):
@@ -848,18 +1019,25 @@ class GmailNotifier:
                 alpha_3y = a.get("alpha_3y")
                 if alpha_1y is None:
                     return "<td></td><td></td>"
-                e1 = "🟢" if alpha_1y > 0 else ("🟡" if alpha_1y > -20 else "🔴")
+                e1 = _alpha_emoji(alpha_1y)
                 if alpha_3y is not None:
-                    e3 = "🟢" if alpha_3y > 0 else ("🟡" if alpha_3y > -20 else "🔴")
+                    e3 = _alpha_emoji(alpha_3y)
                     td3 = f"<td>{e3} {alpha_3y:+.0f}%</td>"
                 else:
                     td3 = "<td></td>"
                 return f"<td>{e1} {alpha_1y:+.0f}%</td>{td3}"
 
-            rows = ""
+            append(f'''
+            <div class="section-block">
+            <h3 style="color:{COLOR_GAIN};">ADD 建議 ({len(new_adds)} 新倉 + {len(pyramid_adds)} 金字塔 + {len(backup_adds)} 備選)</h3>
+            <table style="border-collapse:collapse;width:100%;">
+                <tr style="background:#f8f9fa;"><th style="padding:8px;text-align:left;">排名</th><th style="text-align:left;">標的</th><th style="text-align:left;">板塊</th><th>建議股數</th><th>目前價格</th><th>動能</th><th>趨勢</th><th>RSI</th><th>1Y vs SPY</th><th>3Y vs SPY</th><th>ML%</th></tr>
+                ''')
             # 新倉 + 金字塔：依排名升序排序
             primary = sorted(new_adds + pyramid_adds, key=lambda x: x.get("momentum_rank") or 9999)
             for a in primary:
+                sym = a["symbol"]
+                shares = a.get("suggested_shares", 0)
                 price = a.get("current_price", 0)
                 momentum = f"+{a.get('momentum', 0):.1f}%"
                 rank = a.get("momentum_rank", "?")
@@ -878,26 +1056,26 @@ class GmailNotifier:
                 ts = a.get("trend_state") or {}
                 ts_state = ts.get("state", "")
                 if ts_state == "轉強":
-                    trend_td = '<td style="text-align:center;color:#28a745;">↗️轉強</td>'
+                    trend_td = f'<td style="text-align:center;color:{COLOR_GAIN};">↗️轉強</td>'
                 elif ts_state == "轉弱":
-                    trend_td = '<td style="text-align:center;color:#dc3545;">↘️轉弱</td>'
+                    trend_td = f'<td style="text-align:center;color:{COLOR_LOSS};">↘️轉弱</td>'
                 else:
                     trend_td = '<td style="text-align:center;color:#6c757d;">→</td>'
 
                 if a.get("is_pyramid"):
                     direction_arrow = "↑" if a.get("direction") == "up" else "↓"
                     tranche_label = f'<span style="color:#0d6efd;">{direction_arrow}第{a["tranche_n"]}批</span>'
-                    shares_str = str(a.get("suggested_shares", 0))
+                    shares_str = str(shares)
                     post_rotate = a.get("suggested_shares_post_rotate")
-                    if post_rotate is not None and post_rotate != a.get("suggested_shares", 0):
-                        shares_str += f'<br><span style="color:#fd7e14;font-size:11px;">ROTATE後 {post_rotate} 股</span>'
-                    rows += f'<tr style="background:#e8f4ff;"><td>#{rank}</td><td><strong>{a["symbol"]}</strong> {tranche_label}{shap_str}</td>{sector_td}<td>{shares_str}</td><td>${price:.2f}</td><td>{momentum}</td>{trend_td}{rsi_html}{alpha_html}{ml_td}</tr>'
+                    if post_rotate is not None and post_rotate != shares:
+                        shares_str += f'<br><span style="color:{COLOR_WARN};font-size:11px;">ROTATE後 {post_rotate} 股</span>'
+                    append(f'<tr style="background:#e8f4ff;"><td>#{rank}</td><td><strong>{sym}</strong> {tranche_label}{shap_str}</td>{sector_td}<td>{shares_str}</td><td>${price:.2f}</td><td>{momentum}</td>{trend_td}{rsi_html}{alpha_html}{ml_td}</tr>')
                 else:
-                    shares_str = str(a.get("suggested_shares", 0))
+                    shares_str = str(shares)
                     post_rotate = a.get("suggested_shares_post_rotate")
-                    if post_rotate is not None and post_rotate != a.get("suggested_shares", 0):
-                        shares_str += f'<br><span style="color:#fd7e14;font-size:11px;">ROTATE後 {post_rotate} 股</span>'
-                    rows += f'<tr><td>#{rank}</td><td>{a["symbol"]}{shap_str}</td>{sector_td}<td>{shares_str}</td><td>${price:.2f}</td><td>{momentum}</td>{trend_td}{rsi_html}{alpha_html}{ml_td}</tr>'
+                    if post_rotate is not None and post_rotate != shares:
+                        shares_str += f'<br><span style="color:{COLOR_WARN};font-size:11px;">ROTATE後 {post_rotate} 股</span>'
+                    append(f'<tr><td>#{rank}</td><td>{sym}{shap_str}</td>{sector_td}<td>{shares_str}</td><td>${price:.2f}</td><td>{momentum}</td>{trend_td}{rsi_html}{alpha_html}{ml_td}</tr>')
 
             for a in backup_adds:
                 price = a.get("current_price", 0)
@@ -905,25 +1083,22 @@ class GmailNotifier:
                 rsi_html = _add_rsi_html(a)
                 alpha_html = _add_alpha_html(a)
                 sector_td = f'<td style="font-size:11px;color:#6c757d;">{a.get("sector") or "—"}</td>'
-                rows += f'<tr style="background:#fff9e6;"><td style="color:#856404;">備#{a.get("momentum_rank", "?")}</td><td>{a["symbol"]}</td>{sector_td}<td style="color:#6c757d;font-size:11px;">備選參考</td><td>${price:.2f}</td><td>{momentum}</td><td></td>{rsi_html}{alpha_html}<td></td></tr>'
-
-            adds_html = f'''
-            <div class="section-block">
-            <h3 style="color:#28a745;">ADD 建議 ({len(new_adds)} 新倉 + {len(pyramid_adds)} 金字塔 + {len(backup_adds)} 備選)</h3>
-            <table style="border-collapse:collapse;width:100%;">
-                <tr style="background:#f8f9fa;"><th style="padding:8px;text-align:left;">排名</th><th style="text-align:left;">標的</th><th style="text-align:left;">板塊</th><th>建議股數</th><th>目前價格</th><th>動能</th><th>趨勢</th><th>RSI</th><th>1Y vs SPY</th><th>3Y vs SPY</th><th>ML%</th></tr>
-                {rows}
+                append(f'<tr style="background:#fff9e6;"><td style="color:#856404;">備#{a.get("momentum_rank", "?")}</td><td>{a["symbol"]}</td>{sector_td}<td style="color:#6c757d;font-size:11px;">備選參考</td><td>${price:.2f}</td><td>{momentum}</td><td></td>{rsi_html}{alpha_html}<td></td></tr>')
+            append('''
             </table>
-            </div>'''
+            </div>''')
 
         # ROTATE 建議（汰弱留強）
-        rotates = [a for a in actions if a["action"] == "ROTATE"]
-        rotates_html = ""
         if rotates:
-            rows = ""
+            append(f'''
+            <div class="section-block">
+            <h3 style="color:{COLOR_WARN};">ROTATE 建議（汰弱留強）({len(rotates)} 組)</h3>
+            <table style="border-collapse:collapse;width:100%;">
+                <tr style="background:#f8f9fa;"><th style="padding:8px;">賣出</th><th>板塊</th><th>股數</th><th>動能</th><th>P&L</th><th>買入</th><th>板塊</th><th>股數</th><th>動能</th><th>1Y</th><th>3Y</th></tr>
+                ''')
             for a in rotates:
                 sell_pnl = a.get("sell_pnl_pct", 0)
-                sell_pnl_color = "#28a745" if sell_pnl and sell_pnl >= 0 else "#dc3545"
+                sell_pnl_color = _pnl_color(sell_pnl, zero_is_gain=False)
                 sell_pnl_str = f"{sell_pnl:+.1f}%" if sell_pnl is not None else "N/A"
 
                 buy_alpha_1y = a.get("buy_alpha_1y")
@@ -931,222 +1106,145 @@ class GmailNotifier:
                 alpha_str = ""
                 alpha_3y_str = ""
                 if buy_alpha_1y is not None:
-                    alpha_emoji = "🟢" if buy_alpha_1y > 0 else ("🟡" if buy_alpha_1y > -20 else "🔴")
+                    alpha_emoji = _alpha_emoji(buy_alpha_1y)
                     alpha_str = f"{alpha_emoji} {buy_alpha_1y:+.0f}%"
                 if buy_alpha_3y is not None:
-                    alpha_3y_emoji = "🟢" if buy_alpha_3y > 0 else ("🟡" if buy_alpha_3y > -20 else "🔴")
+                    alpha_3y_emoji = _alpha_emoji(buy_alpha_3y)
                     alpha_3y_str = f"{alpha_3y_emoji} {buy_alpha_3y:+.0f}%"
 
                 sell_sector = a.get("sell_sector") or "—"
                 buy_sector = a.get("buy_sector") or "—"
-                rows += f'''<tr style="border-bottom:1px solid #ddd;">
-                    <td style="padding:8px;color:#dc3545;">賣 {a["sell_symbol"]}</td>
+                append(f'''<tr style="border-bottom:1px solid #ddd;">
+                    <td style="padding:8px;color:{COLOR_LOSS};">賣 {a["sell_symbol"]}</td>
                     <td style="font-size:11px;color:#6c757d;">{sell_sector}</td>
                     <td>{a["sell_shares"]} 股</td>
                     <td>{a["sell_momentum"]:+.1f}%</td>
                     <td style="color:{sell_pnl_color}">{sell_pnl_str}</td>
-                    <td style="color:#28a745;">→ 買 {a["buy_symbol"]}</td>
+                    <td style="color:{COLOR_GAIN};">→ 買 {a["buy_symbol"]}</td>
                     <td style="font-size:11px;color:#6c757d;">{buy_sector}</td>
                     <td>{a["buy_shares"]} 股</td>
                     <td>+{a["buy_momentum"]:.1f}%</td>
                     <td>{alpha_str}</td>
                     <td>{alpha_3y_str}</td>
-                </tr>'''
-            rotates_html = f'''
-            <div class="section-block">
-            <h3 style="color:#fd7e14;">ROTATE 建議（汰弱留強）({len(rotates)} 組)</h3>
-            <table style="border-collapse:collapse;width:100%;">
-                <tr style="background:#f8f9fa;"><th style="padding:8px;">賣出</th><th>板塊</th><th>股數</th><th>動能</th><th>P&L</th><th>買入</th><th>板塊</th><th>股數</th><th>動能</th><th>1Y</th><th>3Y</th></tr>
-                {rows}
+                </tr>''')
+            append('''
             </table>
-            </div>'''
-
-        topups_html = ""
-
-        # 需注意
-        watch_items = []
-        weak = [a for a in actions if a["action"] == "HOLD" and (a.get("momentum") or 0) < 0]
-        for a in sorted(weak, key=lambda x: x.get("momentum", 0)):
-            ts = a.get("trend_state", {}) or {}
-            trend = ts.get("state", "")
-            watch_items.append(f'<li>⚠️ <strong>{a["symbol"]}</strong> 動能{a.get("momentum", 0):+.1f}% {trend}，P&L: {a.get("pnl_pct", 0):+.1f}%</li>')
-        losing = [a for a in actions if a["action"] == "HOLD" and (a.get("pnl_pct") or 0) < -3 and (a.get("momentum") or 0) >= 0]
-        for a in sorted(losing, key=lambda x: x.get("pnl_pct", 0)):
-            stop_price = round(a["avg_price"] * 0.85, 2)
-            watch_items.append(f'<li>🔴 <strong>{a["symbol"]}</strong> P&L {a.get("pnl_pct", 0):+.1f}%，停損線 ${stop_price:.2f}</li>')
-        rotates_list = [a for a in actions if a["action"] == "ROTATE"]
-        for a in rotates_list:
-            if (a.get("buy_alpha_1y") or 0) < -20:
-                watch_items.append(f'<li>⚠️ ROTATE <strong>{a["sell_symbol"]}→{a["buy_symbol"]}</strong> 換股目標 1Y落後大盤 {a.get("buy_alpha_1y", 0):+.0f}%，建議謹慎</li>')
-        watch_html = ""
-        if watch_items:
-            items_str = "".join(watch_items)
-            watch_html = f'<div style="background:#f8d7da;padding:12px;border-radius:5px;margin:10px 0;"><strong>需注意</strong><ul style="margin:5px 0;">{items_str}</ul></div>'
+            </div>''')
 
         # 台股部位（新格式：tw_actions）
         tw_actions_list = data.get("tw_actions", [])
         tw_cash_val  = data.get("tw_cash")
         tw_total_val = data.get("tw_total")
         tw_positions_snap = (data.get("portfolio_snapshot") or {}).get("tw_positions", {})
-        tw_portfolio_html = ""
         if tw_cash_val is not None or tw_actions_list:
             tw_exits = [a for a in tw_actions_list if a["action"] == "TW_EXIT"]
             tw_adds  = [a for a in tw_actions_list if a["action"] == "TW_ADD"]
+            tw_exit_syms = {a["symbol"] for a in tw_exits}
             cash_ntd  = tw_cash_val or 0
             total_ntd = tw_total_val or 0
             pos_ntd   = total_ntd - cash_ntd
 
+            append('<div class="section-block" style="margin-top:20px;">'
+                   f'<h3 style="color:#0d6efd;">{TW_FLAG} 台股部位</h3>'
+                   f'<p style="margin:4px 0;font-size:12px;">現金 NT${cash_ntd:,.0f} &nbsp;|&nbsp; 持倉 NT${pos_ntd:,.0f} &nbsp;|&nbsp; 合計 NT${total_ntd:,.0f}</p>')
+
             # 持倉列
-            hold_rows = ""
-            for sym, pos in tw_positions_snap.items():
-                if sym in [a["symbol"] for a in tw_exits]:
-                    continue
-                hold_rows += (f'<tr><td style="padding:5px 8px;font-weight:bold;">{sym}</td>'
-                              f'<td style="padding:5px 8px;">{pos.get("shares",0)} 股</td>'
-                              f'<td style="padding:5px 8px;">NT${pos.get("avg_price",0):.0f}</td>'
-                              f'<td style="padding:5px 8px;color:#6c757d;">HOLD</td></tr>')
-            for a in tw_exits:
-                pnl_color = "#28a745" if a.get("pnl_pct", 0) >= 0 else "#dc3545"
-                hold_rows += (f'<tr style="background:#fdf2f2;"><td style="padding:5px 8px;font-weight:bold;">{a["symbol"]}</td>'
-                              f'<td style="padding:5px 8px;">{a.get("shares",0)} 股</td>'
-                              f'<td style="padding:5px 8px;">NT${a.get("avg_price",0):.0f}</td>'
-                              f'<td style="padding:5px 8px;color:{pnl_color};">⛔ EXIT {a.get("pnl_pct",0):+.1f}% — {a.get("reason","")}</td></tr>')
+            hold_syms = [sym for sym in tw_positions_snap if sym not in tw_exit_syms]
+            if hold_syms or tw_exits:
+                append('<table style="border-collapse:collapse;width:100%;font-size:12px;margin-bottom:8px;">'
+                       '<tr style="background:#dce9ff;"><th style="padding:5px 8px;text-align:left;">標的</th><th>股數</th><th>成本</th><th style="text-align:left;">狀態</th></tr>')
+                for sym in hold_syms:
+                    pos = tw_positions_snap[sym]
+                    append(f'<tr><td style="padding:5px 8px;font-weight:bold;">{sym}</td>'
+                           f'<td style="padding:5px 8px;">{pos.get("shares",0)} 股</td>'
+                           f'<td style="padding:5px 8px;">NT${pos.get("avg_price",0):.0f}</td>'
+                           f'<td style="padding:5px 8px;color:#6c757d;">HOLD</td></tr>')
+                for a in tw_exits:
+                    pnl_color = _pnl_color(a.get("pnl_pct", 0))
+                    append(f'<tr style="background:#fdf2f2;"><td style="padding:5px 8px;font-weight:bold;">{a["symbol"]}</td>'
+                           f'<td style="padding:5px 8px;">{a.get("shares",0)} 股</td>'
+                           f'<td style="padding:5px 8px;">NT${a.get("avg_price",0):.0f}</td>'
+                           f'<td style="padding:5px 8px;color:{pnl_color};">⛔ EXIT {a.get("pnl_pct",0):+.1f}% — {a.get("reason","")}</td></tr>')
+                append('</table>')
+            else:
+                append('<p style="font-size:12px;color:#6c757d;margin:4px 0;">（尚無持倉）</p>')
 
             # ADD 建議列
-            add_rows = ""
-            for a in tw_adds:
-                m_color = "#28a745" if a.get("momentum", 0) > 0 else "#dc3545"
-                add_rows += (f'<tr><td style="padding:5px 8px;font-weight:bold;">#{a.get("rank","?")}</td>'
-                             f'<td style="padding:5px 8px;">{a["symbol"]}</td>'
-                             f'<td style="padding:5px 8px;">{a.get("name","")}</td>'
-                             f'<td style="padding:5px 8px;color:{m_color};">{a.get("momentum",0):+.1f}%</td>'
-                             f'<td style="padding:5px 8px;">{a.get("trend_state","")}</td>'
-                             f'<td style="padding:5px 8px;">{a.get("suggested_shares",0)} 股</td>'
-                             f'<td style="padding:5px 8px;">NT${a.get("current_price",0):.0f}</td></tr>')
-
-            hold_table = (f'<table style="border-collapse:collapse;width:100%;font-size:12px;margin-bottom:8px;">'
-                          f'<tr style="background:#dce9ff;"><th style="padding:5px 8px;text-align:left;">標的</th><th>股數</th><th>成本</th><th style="text-align:left;">狀態</th></tr>'
-                          f'{hold_rows}</table>') if hold_rows else '<p style="font-size:12px;color:#6c757d;margin:4px 0;">（尚無持倉）</p>'
-
-            add_table = (f'<h4 style="margin:10px 0 4px;font-size:12px;">➕ ADD 建議（{len(tw_adds)} 支）</h4>'
-                         f'<table style="border-collapse:collapse;width:100%;font-size:12px;">'
-                         f'<tr style="background:#dce9ff;"><th style="padding:5px 8px;">排名</th><th style="text-align:left;">代碼</th><th style="text-align:left;">名稱</th><th>動能</th><th style="text-align:left;">趨勢</th><th>建議股數</th><th>現價</th></tr>'
-                         f'{add_rows}</table>') if add_rows else ''
-
-            tw_portfolio_html = (
-                f'<div class="section-block" style="margin-top:20px;">'
-                f'<h3 style="color:#0d6efd;">🇹🇼 台股部位</h3>'
-                f'<p style="margin:4px 0;font-size:12px;">現金 NT${cash_ntd:,.0f} &nbsp;|&nbsp; 持倉 NT${pos_ntd:,.0f} &nbsp;|&nbsp; 合計 NT${total_ntd:,.0f}</p>'
-                f'{hold_table}{add_table}'
-                f'</div>'
-            )
+            if tw_adds:
+                append(f'<h4 style="margin:10px 0 4px;font-size:12px;">➕ ADD 建議（{len(tw_adds)} 支）</h4>'
+                       '<table style="border-collapse:collapse;width:100%;font-size:12px;">'
+                       '<tr style="background:#dce9ff;"><th style="padding:5px 8px;">排名</th><th style="text-align:left;">代碼</th><th style="text-align:left;">名稱</th><th>動能</th><th style="text-align:left;">趨勢</th><th>建議股數</th><th>現價</th></tr>')
+                for a in tw_adds:
+                    m_color = COLOR_GAIN if a.get("momentum", 0) > 0 else COLOR_LOSS
+                    append(f'<tr><td style="padding:5px 8px;font-weight:bold;">#{a.get("rank","?")}</td>'
+                           f'<td style="padding:5px 8px;">{a["symbol"]}</td>'
+                           f'<td style="padding:5px 8px;">{a.get("name","")}</td>'
+                           f'<td style="padding:5px 8px;color:{m_color};">{a.get("momentum",0):+.1f}%</td>'
+                           f'<td style="padding:5px 8px;">{a.get("trend_state","")}</td>'
+                           f'<td style="padding:5px 8px;">{a.get("suggested_shares",0)} 股</td>'
+                           f'<td style="padding:5px 8px;">NT${a.get("current_price",0):.0f}</td></tr>')
+                append('</table>')
+
+            append('</div>')
 
         # 台股觀察（舊格式：tw_stocks，掃描器輸出）
         tw_stocks = data.get("tw_stocks", {})
-        tw_stocks_html = ""
         if tw_stocks:
-            leaders = tw_stocks.get("leaders", [])
-            laggards = tw_stocks.get("laggards", [])
-
-            leader_rows = ""
-            for t in leaders:
+            append(f'''
+            <h3>{TW_FLAG} 台股觀察（{tw_stocks.get("scan_count", 0)} 檔高流動性股）</h3>
+            <table style="border-collapse:collapse;width:100%;">
+                <tr style="background:#f8f9fa;"><th style="padding:8px;">排名</th><th>代碼</th><th>名稱</th><th>動能</th><th>1Y vs 0050</th></tr>
+                <tr><td colspan="5" style="background:#d4edda;padding:4px;"><strong>動能領先</strong></td></tr>
+                ''')
+            for t in tw_stocks.get("leaders", []):
                 alpha = t.get("alpha_1y")
                 alpha_str = ""
                 if alpha is not None:
-                    alpha_emoji = "🟢" if alpha > 0 else ("🟡" if alpha > -10 else "🔴")
+                    alpha_emoji = _alpha_emoji(alpha, _TW_ALPHA_THRESHOLDS)
                     alpha_str = f"{alpha_emoji} {alpha:+.0f}%"
-                leader_rows += f'<tr><td style="padding:4px;">#{t["rank"]}</td><td>{t["symbol"]}</td><td>{t.get("name", "")}</td><td style="color:#28a745;">+{t["momentum"]:.1f}%</td><td>{alpha_str}</td></tr>'
-
-            laggard_rows = ""
-            for t in laggards:
-                laggard_rows += f'<tr><td style="padding:4px;">#{t["rank"]}</td><td>{t["symbol"]}</td><td>{t.get("name", "")}</td><td style="color:#dc3545;">{t["momentum"]:.1f}%</td><td></td></tr>'
-
-            tw_stocks_html = f'''
-            <h3>🇹🇼 台股觀察（{tw_stocks.get("scan_count", 0)} 檔高流動性股）</h3>
-            <table style="border-collapse:collapse;width:100%;">
-                <tr style="background:#f8f9fa;"><th style="padding:8px;">排名</th><th>代碼</th><th>名稱</th><th>動能</th><th>1Y vs 0050</th></tr>
-                <tr><td colspan="5" style="background:#d4edda;padding:4px;"><strong>動能領先</strong></td></tr>
-                {leader_rows}
+                append(f'<tr><td style="padding:4px;">#{t["rank"]}</td><td>{t["symbol"]}</td><td>{t.get("name", "")}</td><td style="color:{COLOR_GAIN};">+{t["momentum"]:.1f}%</td><td>{alpha_str}</td></tr>')
+            append('''
                 <tr><td colspan="5" style="background:#f8d7da;padding:4px;"><strong>動能落後</strong></td></tr>
-                {laggard_rows}
-            </table>'''
+                ''')
+            for t in tw_stocks.get("laggards", []):
+                append(f'<tr><td style="padding:4px;">#{t["rank"]}</td><td>{t["symbol"]}</td><td>{t.get("name", "")}</td><td style="color:{COLOR_LOSS};">{t["momentum"]:.1f}%</td><td></td></tr>')
+            append('''
+            </table>''')
 
-        html = f'''
-        <html>
-        <body style="font-family:Arial,sans-serif;padding:16px;color:#333;">
-            <h2>盤前報告 {data["date"]}</h2>
-            <p style="color:#6c757d;">版本 {data.get("version", "N/A")}</p>
+        append(_REPORT_HTML_TAIL)
+        return "".join(out)
 
-            <table style="border-collapse:collapse;width:100%;margin:20px 0;">
-                <tr><td style="padding:8px;border-bottom:1px solid #ddd;">投組總值</td><td style="padding:8px;border-bottom:1px solid #ddd;"><strong>${portfolio.get("total_value", 0):,.2f}</strong></td></tr>
-                <tr><td style="padding:8px;border-bottom:1px solid #ddd;">現金</td><td style="padding:8px;border-bottom:1px solid #ddd;">${portfolio.get("cash", 0):,.2f}</td></tr>
-                <tr><td style="padding:8px;border-bottom:1px solid #ddd;">個股</td><td style="padding:8px;border-bottom:1px solid #ddd;">{portfolio.get("individual_count", 0)}/30 檔</td></tr>
-                {yearly_html}
-            </table>
-
-            {regime_html}
-            {menv_html_full}
-            {triple_html_full}
-            {alerts_html}
-            {watch_html}
-            {portfolio_html}
-            {exits_html}
-            {holds_html}
-            {adds_html}
-            {rotates_html}
-            {topups_html}
-            {tw_portfolio_html}
-            {tw_stocks_html}
-
-            <hr style="margin:30px 0;border:none;border-top:1px solid #ddd;">
-            <p style="color:#6c757d;font-size:12px;">此郵件由盤前建議系統自動發送</p>
-        </body>
-        </html>
-        '''
-        return html
-
-    def _send_email(self, subject, text_body, html_body=None, attachments=None):
-        """發送郵件
+    def _send_email(self, subject, text_body, html_body=None, attachments=None, recipients=None):
+        """發送郵件（所有收件人共用同一封訊息與同一條 SMTP 連線）
 
         Args:
             subject: 郵件主旨
             text_body: 純文字內容
             html_body: HTML 內容（可選）
             attachments: list of (filename, bytes)，附件（可選）
+            recipients: 收件人 list（可選，預設 self.recipients）
 
         Returns:
             bool: 是否成功
         """
         try:
-            if attachments:
-                msg = MIMEMultipart("mixed")
-                msg["Subject"] = subject
-                msg["From"] = self.sender
-                msg["To"] = self.recipient
-
-                body_part = MIMEMultipart("alternative")
-                body_part.attach(MIMEText(text_body, "plain", "utf-8"))
-                if html_body:
-                    body_part.attach(MIMEText(html_body, "html", "utf-8"))
-                msg.attach(body_part)
-
-                for filename, data in attachments:
-                    part = MIMEApplication(data, Name=filename)
-                    part["Content-Disposition"] = f'attachment; filename="{filename}"'
-                    msg.attach(part)
-            else:
-                msg = MIMEMultipart("alternative")
-                msg["Subject"] = subject
-                msg["From"] = self.sender
-                msg["To"] = self.recipient
-
-                msg.attach(MIMEText(text_body, "plain", "utf-8"))
-                if html_body:
-                    msg.attach(MIMEText(html_body, "html", "utf-8"))
+            msg = EmailMessage()
+            msg["Subject"] = subject
+            msg["From"] = self.sender
+            msg["To"] = ", ".join(recipients or self.recipients)
+
+            msg.set_content(text_body)
+            if html_body:
+                msg.add_alternative(html_body, subtype="html")
+
+            for filename, data in attachments or []:
+                msg.add_attachment(
+                    data, maintype="application", subtype="octet-stream", filename=filename
+                )
 
             with smtplib.SMTP_SSL("smtp.gmail.com", 465) as server:
                 server.login(self.sender, self.password)
-                server.sendmail(self.sender, [self.recipient], msg.as_string())
+                server.send_message(msg)
 
             return True
 
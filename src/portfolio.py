@@ -1,34 +1,63 @@
 import json
 import os
+import sys
 from datetime import date
 
+try:
+    import orjson  # 選用：C 實作解析較快，未安裝時退回標準 json
+except ImportError:
+    orjson = None
+
 
 PORTFOLIO_PATH = os.path.join("data", "portfolio.json")
 WATCHLIST_PATH = os.path.join("data", "watchlist.json")
+TRANSACTIONS_ARCHIVE_DIR = os.path.join("data", "transactions")
+MAX_LIVE_TRANSACTIONS = 500  # portfolio.json 只保留最近 N 筆，較舊的移至月檔
+
+
+def _atomic_write_json(obj, path):
+    """先寫入暫存檔再 os.replace，避免中斷時留下半寫入的 JSON"""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(obj, f, indent=2, ensure_ascii=False)
+    os.replace(tmp, path)
+
+
+def _load_json(path):
+    """讀取 JSON 檔（有 orjson 時以 bytes 直接解析）"""
+    with open(path, "rb") as f:
+        data = f.read()
+    if orjson is not None:
+        try:
+            return orjson.loads(data)
+        except orjson.JSONDecodeError:
+            pass  # 含 NaN 等 orjson 不接受的標記時退回標準 json
+    return json.loads(data)
 
 
 def load_portfolio(path=PORTFOLIO_PATH):
     """讀取持倉狀態，不存在則回傳空投組"""
     if os.path.exists(path):
-        with open(path, "r", encoding="utf-8") as f:
-            return json.load(f)
+        portfolio = _load_json(path)
+        # 持倉代碼 intern，與動能排名的代碼為同一物件，查表時可直接比對指標
+        positions = portfolio.get("positions")
+        if positions:
+            portfolio["positions"] = {sys.intern(s): p for s, p in positions.items()}
+        return portfolio
     return {"cash": 0, "updated": "", "positions": {}, "transactions": []}
 
 
 def save_portfolio(portfolio, path=PORTFOLIO_PATH):
     """寫入持倉狀態"""
     portfolio["updated"] = str(date.today())
-    os.makedirs(os.path.dirname(path), exist_ok=True)
-    with open(path, "w", encoding="utf-8") as f:
-        json.dump(portfolio, f, indent=2, ensure_ascii=False)
+    _atomic_write_json(portfolio, path)
 
 
 def get_individual_count(portfolio):
-    """回傳非 core 持倉數量"""
-    return sum(
-        1 for pos in portfolio["positions"].values()
-        if not pos.get("core", False)
-    )
+    """回傳非 core 持倉數量（core 只有少數幾檔，扣掉 core 比逐檔計數個股快）"""
+    positions = portfolio["positions"]
+    return len(positions) - sum(1 for pos in positions.values() if pos.get("core", False))
 
 
 def calc_avg_price(current_avg, current_shares, new_price, new_shares):
@@ -54,8 +83,76 @@ def _ensure_tranches(pos):
     return pos
 
 
+def _last_archive_seq(path):
+    """月檔中最後一筆的 archive_seq；檔案不存在時回傳 -1"""
+    if not os.path.exists(path):
+        return -1
+    last = -1
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                last = json.loads(line).get("archive_seq", last)
+    return last
+
+
+def archive_old_transactions(portfolio, archive_dir=TRANSACTIONS_ARCHIVE_DIR,
+                             max_live=MAX_LIVE_TRANSACTIONS):
+    """超過 max_live 的舊交易移至 {archive_dir}/{YYYY-MM}.jsonl（append-only）
+
+    每筆封存列帶遞增序號 archive_seq（起點為 portfolio["archived_transactions"]）。
+    若之後 save_portfolio 失敗，下次會重新封存同一批、得到相同序號，
+    已寫入月檔的序號會被略過，不會重複。
+
+    Returns:
+        int: 移出的筆數
+    """
+    txs = portfolio.get("transactions", [])
+    overflow = len(txs) - max_live
+    if overflow <= 0:
+        return 0
+
+    base_seq = portfolio.get("archived_transactions", 0)
+    by_month = {}
+    for i, tx in enumerate(txs[:overflow]):
+        month = str(tx.get("date", ""))[:7] or "unknown"
+        by_month.setdefault(month, []).append(dict(tx, archive_seq=base_seq + i))
+
+    os.makedirs(archive_dir, exist_ok=True)
+    for month, rows in by_month.items():
+        path = os.path.join(archive_dir, f"{month}.jsonl")
+        last_seq = _last_archive_seq(path)
+        rows = [tx for tx in rows if tx["archive_seq"] > last_seq]
+        if rows:
+            with open(path, "a", encoding="utf-8") as f:
+                f.writelines(json.dumps(tx, ensure_ascii=False) + "\n" for tx in rows)
+
+    portfolio["transactions"] = txs[overflow:]
+    portfolio["archived_transactions"] = base_seq + overflow
+    return overflow
+
+
+def load_all_transactions(portfolio, archive_dir=TRANSACTIONS_ARCHIVE_DIR):
+    """回傳完整交易紀錄（月檔封存 + portfolio 內的近期交易）
+
+    封存列依 archive_seq 還原原始順序（無日期的 unknown.jsonl 也會排回正確位置）。
+    """
+    archived = []
+    if os.path.isdir(archive_dir):
+        for name in os.listdir(archive_dir):
+            if not name.endswith(".jsonl"):
+                continue
+            with open(os.path.join(archive_dir, name), "r", encoding="utf-8") as f:
+                archived.extend(json.loads(line) for line in f if line.strip())
+    archived.sort(key=lambda tx: tx.get("archive_seq", 0))
+    archived = [{k: v for k, v in tx.items() if k != "archive_seq"} for tx in archived]
+    return archived + portfolio.get("transactions", [])
+
+
 def apply_confirmed_actions(portfolio, confirmed_actions):
-    """套用 confirmed actions，更新 positions + 追加 transactions"""
+    """套用 confirmed actions，更新 positions + 追加 transactions
+
+    transactions 超過 MAX_LIVE_TRANSACTIONS 時，較舊的會移至月檔封存。
+    """
     for action in confirmed_actions:
         if action.get("status") != "confirmed":
             continue
@@ -242,21 +339,20 @@ def apply_confirmed_actions(portfolio, confirmed_actions):
                     "shares": buy_shares, "price": buy_price,
                 })
 
+    archive_old_transactions(portfolio)
+
 
 def load_watchlist(path=WATCHLIST_PATH):
     """讀取白名單"""
     if os.path.exists(path):
-        with open(path, "r", encoding="utf-8") as f:
-            return json.load(f)
+        return _load_json(path)
     return {"symbols": [], "updated": ""}
 
 
 def save_watchlist(watchlist, path=WATCHLIST_PATH):
     """寫入白名單"""
     watchlist["updated"] = str(date.today())
-    os.makedirs(os.path.dirname(path), exist_ok=True)
-    with open(path, "w", encoding="utf-8") as f:
-        json.dump(watchlist, f, indent=2, ensure_ascii=False)
+    _atomic_write_json(watchlist, path)
 
 
 def add_to_watchlist(symbols, path=WATCHLIST_PATH):
@@ -1,6 +1,7 @@
-import math
+import heapq
 from datetime import date
-from src.risk import check_all_exit_conditions, check_position_limit, TRANCHE_PARAMS
+from operator import itemgetter
+from src.risk import check_all_exit_conditions, check_position_limit, TRANCHE_PARAMS, _parse_date
 from src.portfolio import _ensure_tranches
 
 VERSION = "0.10.0"  # 金字塔加碼策略（差異停損），取代 TOPUP 機制
@@ -13,6 +14,117 @@ ROTATE_HOLDING_DAYS_MIN = 30   # 最少持有天數，從 60 天降至 30 天
 MAX_PYRAMID = 5       # 最大批次數（同回測最佳參數）
 MAX_PYRAMID_SHOW = 3  # 每日最多顯示的金字塔加碼建議數
 
+# momentum_ranks 每筆必含 "momentum"（rank_by_momentum 產出），以 C 層 itemgetter 取值
+_get_momentum = itemgetter("momentum")
+
+# 持有理由（依動能分三級：強勁 > 10%、正向 > 0%、偏弱）
+_HOLD_REASON_FORMATS = (
+    "持有中，動能強勁 (+%.1f%%)",
+    "持有中，動能正向 (+%.1f%%)",
+    "持有中，動能偏弱 (%.1f%%)",
+)
+
+# RSI 警告參數（回測顯示飆股超買後仍可續漲，故只警告不過濾）
+RSI_OVERBOUGHT = 75  # RSI > 75 超買警告
+RSI_EXTREME = 80     # RSI > 80 極度超買警告
+
+# HOLD / EXIT action 的欄位樣板：每列 copy() 後填值，省去逐列建立 dict literal
+_HOLD_TEMPLATE = {
+    "id": None,
+    "action": "HOLD",
+    "symbol": None,
+    "shares": None,
+    "current_price": None,
+    "avg_price": None,
+    "high_since_entry": None,
+    "pnl_pct": None,
+    "momentum": None,
+    "momentum_rank": None,
+    "alpha_1y": None,
+    "trend_state": None,
+    "reason": None,
+    "source": "momentum",
+    "status": "auto",
+    "tranches": None,
+    "stop_pending": None,
+}
+_EXIT_TEMPLATE = {
+    "id": None,
+    "action": "EXIT",
+    "symbol": None,
+    "shares": None,
+    "tranche_n": None,
+    "current_price": None,
+    "avg_price": None,
+    "high_since_entry": None,
+    "pnl_pct": None,
+    "momentum": None,
+    "alpha_1y": None,
+    "trend_state": None,
+    "reason": None,
+    "source": None,
+    "status": "pending",
+}
+
+
+def _affordable_shares(budget, price):
+    """以預算 budget 在價格 price 可買的整股數（無效價格或預算時為 0）"""
+    if price <= 0 or budget <= 0:
+        return 0
+    return int(budget // price)
+
+
+def _rsi_warning(rsi):
+    """RSI 超買警告後綴（呼叫端已確認 rsi > RSI_OVERBOUGHT）"""
+    if rsi > RSI_EXTREME:
+        return " 🔴 RSI %.0f 極度超買" % rsi
+    return " 🟡 RSI %.0f 超買" % rsi
+
+
+def _pnl_pct(price, avg_price):
+    """損益百分比（無報價或成本為 0 時回傳 None）
+
+    保留 round() 而非整數基點截斷：pnl_pct 會寫入 actions_*.json 並顯示於報告，
+    截斷會讓小數第二位與既有紀錄不一致。每檔每日只算一次，成本可忽略。
+    """
+    if price is None or avg_price <= 0:
+        return None
+    return round((price - avg_price) / avg_price * 100, 2)
+
+
+def _holding_days(pos, today):
+    """計算持有天數"""
+    first_entry = pos.get("first_entry")
+    if first_entry:
+        try:
+            entry_date = _parse_date(first_entry)
+            return (today - entry_date).days
+        except ValueError:
+            return 999
+    # 沒有 first_entry 時，從 tranches 推算
+    tranches = pos.get("tranches", [])
+    if tranches:
+        try:
+            earliest = min(t["entry_date"] for t in tranches if t.get("entry_date"))
+            return (today - _parse_date(earliest[:10])).days
+        except (ValueError, KeyError):
+            pass
+    return 999
+
+
+def _any_tranche_in_protection(pos, today):
+    """任一批次仍在保護期內，則整個持倉不可 ROTATE"""
+    for t in pos.get("tranches", []):
+        try:
+            entry_dt = _parse_date(t["entry_date"][:10])
+            days_held = (today - entry_dt).days
+            protect = TRANCHE_PARAMS.get(t.get("stop_type", "standard"), TRANCHE_PARAMS["standard"])["protect"]
+            if days_held < protect:
+                return True
+        except (ValueError, KeyError):
+            pass
+    return False
+
 
 def generate_actions(portfolio, current_prices, ma200_prices=None, momentum_ranks=None, alpha_1y_map=None, trend_state_map=None, alpha_3y_map=None, market_regime="BULL", vix=20.0, volumes=None, vol_map=None):
     """盤前決策引擎（動能策略 + 三層出場 + 趨勢狀態 + 市場體制）
@@ -29,7 +141,8 @@ def generate_actions(portfolio, current_prices, ma200_prices=None, momentum_rank
                        BEAR 時停止產出 ADD / ROTATE，只做 HOLD / EXIT
 
     Returns:
-        actions: list of action dicts
+        actions: list of action dicts（依 id 順序，每個 action 一列；
+                 premarket_main、notifier 與 data/actions_*.json 皆以列為單位讀寫）
     """
     if ma200_prices is None:
         ma200_prices = {}
@@ -42,12 +155,16 @@ def generate_actions(portfolio, current_prices, ma200_prices=None, momentum_rank
     if alpha_3y_map is None:
         alpha_3y_map = {}
 
+    positions = portfolio.get("positions", {})
+    if not positions and not momentum_ranks:
+        return []  # 空投組且無排名資料：沒有可持有、出場或買入的標的
+
     actions = []
     action_id = 0
-    positions = portfolio.get("positions", {})
 
     # 建立動能查詢表
     momentum_map = {m["symbol"]: m for m in momentum_ranks}
+    sym_momentum = {m["symbol"]: _get_momentum(m) for m in momentum_ranks}
 
     # === 1. 出場條件檢查 ===
     # 1. 固定停損（-15% from cost）
@@ -59,13 +176,22 @@ def generate_actions(portfolio, current_prices, ma200_prices=None, momentum_rank
         vix=vix or 20.0, volumes=volumes,
         vol_map=vol_map,
     )
+    # 會產出 EXIT 的標的（check_all_exit_conditions 已排除核心持倉）
+    exit_symbols = set(exit_signals)
 
     # === 2. 遍歷所有持倉，產出 HOLD / EXIT ===
+    # 每檔損益只算一次，ROTATE 的 sell_pnl_pct 直接沿用
+    pnl_map = {}
+    # 可換股的持倉（供第 4 節）在同一趟迴圈收集：排除核心、偏愛、已出場、保護期內、轉強中
+    today = date.today()
+    collect_rotatable = market_regime != "BEAR"
+    rotatable_positions = []
+    # EXIT 預估回收金額邊產出邊累計，後續不必再掃 actions
+    exit_proceeds = 0
     for symbol, pos in positions.items():
         price = current_prices.get(symbol)
-        pnl_pct = None
-        if price is not None and pos["avg_price"] > 0:
-            pnl_pct = round((price - pos["avg_price"]) / pos["avg_price"] * 100, 2)
+        avg_price = pos["avg_price"]  # 同一持倉多處使用，只查一次
+        pnl_pct = pnl_map[symbol] = _pnl_pct(price, avg_price)
 
         # 取得該持倉的動能資訊
         m_info = momentum_map.get(symbol, {})
@@ -92,7 +218,7 @@ def generate_actions(portfolio, current_prices, ma200_prices=None, momentum_rank
                 "symbol": symbol,
                 "shares": pos["shares"],
                 "current_price": price,
-                "avg_price": pos["avg_price"],
+                "avg_price": avg_price,
                 "high_since_entry": high_price,
                 "pnl_pct": pnl_pct,
                 "momentum": momentum,
@@ -109,59 +235,50 @@ def generate_actions(portfolio, current_prices, ma200_prices=None, momentum_rank
             for exit_item in exit_signals[symbol]:
                 action_id += 1
                 exit_tranche_ns.add(exit_item["tranche_n"])
-                actions.append({
-                    "id": action_id,
-                    "action": "EXIT",
-                    "symbol": symbol,
-                    "shares": exit_item["tranche_shares"],
-                    "tranche_n": exit_item["tranche_n"],
-                    "current_price": price,
-                    "avg_price": pos["avg_price"],
-                    "high_since_entry": high_price,
-                    "pnl_pct": pnl_pct,
-                    "momentum": momentum,
-                    "alpha_1y": alpha_1y,
-                    "trend_state": trend_state,
-                    "reason": exit_item["message"],
-                    "source": exit_item["reason"],
-                    "status": "pending",
-                })
+                exit_proceeds += current_prices.get(symbol, 0) * exit_item["tranche_shares"]
+                row = _EXIT_TEMPLATE.copy()
+                row["id"] = action_id
+                row["symbol"] = symbol
+                row["shares"] = exit_item["tranche_shares"]
+                row["tranche_n"] = exit_item["tranche_n"]
+                row["current_price"] = price
+                row["avg_price"] = avg_price
+                row["high_since_entry"] = high_price
+                row["pnl_pct"] = pnl_pct
+                row["momentum"] = momentum
+                row["alpha_1y"] = alpha_1y
+                row["trend_state"] = trend_state
+                row["reason"] = exit_item["message"]
+                row["source"] = exit_item["reason"]
+                actions.append(row)
             # 若還有其他批次未觸發停損，補一個 HOLD 讓 PDF 正確顯示剩餘批次
             _ensure_tranches(pos)
             remaining = [t for t in pos["tranches"] if t["n"] not in exit_tranche_ns]
             if remaining:
                 action_id += 1
                 # 同一標的的 pending_stops 也要帶過來，確保 stop_pending_since 能被存檔
-                remaining_pending = pending_stops.get(symbol)
-                actions.append({
-                    "id": action_id,
-                    "action": "HOLD",
-                    "symbol": symbol,
-                    "shares": sum(t["shares"] for t in remaining),
-                    "current_price": price,
-                    "avg_price": pos["avg_price"],
-                    "high_since_entry": high_price,
-                    "pnl_pct": pnl_pct,
-                    "momentum": momentum,
-                    "momentum_rank": rank,
-                    "alpha_1y": alpha_1y,
-                    "trend_state": trend_state,
-                    "reason": f"持有中（其餘 {len(remaining)} 批未觸停損）",
-                    "source": "momentum",
-                    "status": "auto",
-                    "tranches": remaining,
-                    "stop_pending": remaining_pending,
-                })
+                row = _HOLD_TEMPLATE.copy()
+                row["id"] = action_id
+                row["symbol"] = symbol
+                row["shares"] = sum(t["shares"] for t in remaining)
+                row["current_price"] = price
+                row["avg_price"] = avg_price
+                row["high_since_entry"] = high_price
+                row["pnl_pct"] = pnl_pct
+                row["momentum"] = momentum
+                row["momentum_rank"] = rank
+                row["alpha_1y"] = alpha_1y
+                row["trend_state"] = trend_state
+                row["reason"] = f"持有中（其餘 {len(remaining)} 批未觸停損）"
+                row["tranches"] = remaining
+                row["stop_pending"] = pending_stops.get(symbol)
+                actions.append(row)
         else:
             # 繼續持有（讓獲利奔跑）
             reason = "持有中"
             if momentum is not None:
-                if momentum > 10:
-                    reason = f"持有中，動能強勁 (+{momentum:.1f}%)"
-                elif momentum > 0:
-                    reason = f"持有中，動能正向 (+{momentum:.1f}%)"
-                else:
-                    reason = f"持有中，動能偏弱 ({momentum:.1f}%)"
+                bucket = 0 if momentum > 10 else 1 if momentum > 0 else 2
+                reason = _HOLD_REASON_FORMATS[bucket] % momentum
 
             # 趨勢狀態警告
             if trend_state:
@@ -175,37 +292,41 @@ def generate_actions(portfolio, current_prices, ma200_prices=None, momentum_rank
 
             action_id += 1
             _ensure_tranches(pos)
-            actions.append({
-                "id": action_id,
-                "action": "HOLD",
-                "symbol": symbol,
-                "shares": pos["shares"],
-                "current_price": price,
-                "avg_price": pos["avg_price"],
-                "high_since_entry": high_price,
-                "pnl_pct": pnl_pct,
-                "momentum": momentum,
-                "momentum_rank": rank,
-                "alpha_1y": alpha_1y,
-                "trend_state": trend_state,
-                "reason": reason,
-                "source": "momentum",
-                "status": "auto",
-                "tranches": pos["tranches"],
-                "stop_pending": stop_pending_items,   # list or None
-            })
+            row = _HOLD_TEMPLATE.copy()
+            row["id"] = action_id
+            row["symbol"] = symbol
+            row["shares"] = pos["shares"]
+            row["current_price"] = price
+            row["avg_price"] = avg_price
+            row["high_since_entry"] = high_price
+            row["pnl_pct"] = pnl_pct
+            row["momentum"] = momentum
+            row["momentum_rank"] = rank
+            row["alpha_1y"] = alpha_1y
+            row["trend_state"] = trend_state
+            row["reason"] = reason
+            row["tranches"] = pos["tranches"]
+            row["stop_pending"] = stop_pending_items   # list or None
+            actions.append(row)
+
+            if (collect_rotatable
+                    and not pos.get("favorite", False)  # 排除偏愛標的
+                    and momentum is not None):
+                holding_days = _holding_days(pos, today)  # 每檔只算一次
+                if (holding_days >= ROTATE_HOLDING_DAYS_MIN
+                        and not _any_tranche_in_protection(pos, today)  # 任一批次在保護期內，不建議 ROTATE
+                        and (trend_state or {}).get("state") != "轉強"):  # 轉強中不換，動能即將回升
+                    rotatable_positions.append((symbol, pos, momentum, holding_days))
 
     # === 3. 新增買入候選（依動能排名，BEAR 市場暫停） ===
     if market_regime == "BEAR":
         return actions  # BEAR 體制：只保留 HOLD / EXIT，不建議新增或換股
+    if not momentum_ranks:
+        return actions  # 無動能排名：沒有買入候選，也沒有可換股的持倉（需動能才能比較）
 
     # === 3. 新增買入候選（依動能排名） ===
     # 計算預估可用現金（假設 EXIT 全部執行，取 85% 避免價差）
     CASH_SAFETY_FACTOR = 0.85
-    exit_proceeds = sum(
-        current_prices.get(a["symbol"], 0) * a["shares"]
-        for a in actions if a["action"] == "EXIT"
-    )
     # 只有「完整出場」的 symbol 才釋放槽位（全部批次都觸發）
     exit_symbols_full = set()
     for sym, exit_list in exit_signals.items():
@@ -222,10 +343,6 @@ def generate_actions(portfolio, current_prices, ma200_prices=None, momentum_rank
     base_slots = check_position_limit(portfolio)
     available_slots = base_slots + exit_count
 
-    # RSI 警告參數（回測顯示飆股超買後仍可續漲，故只警告不過濾）
-    RSI_OVERBOUGHT = 75  # RSI > 75 超買警告
-    RSI_EXTREME = 80     # RSI > 80 極度超買警告
-
     num_to_add = 0  # 供後續 post-rotate 計算使用
 
     # Alpha 過濾：1Y > 0 AND 3Y > -30%（輕微落後視為宏觀打趴，允許進主清單）
@@ -241,16 +358,17 @@ def generate_actions(portfolio, current_prices, ma200_prices=None, momentum_rank
 
     if available_slots > 0 and momentum_ranks:
         # 篩選：動能 > 0 + 尚未持有 + 不在 EXIT 名單
-        exit_symbols = {a["symbol"] for a in actions if a["action"] == "EXIT"}
         buy_candidates = [
             m for m in momentum_ranks
-            if m.get("momentum", 0) > 0
+            if _get_momentum(m) > 0
             and m["symbol"] not in positions
             and m["symbol"] not in exit_symbols
         ]
 
-        alpha_good = [m for m in buy_candidates if _alpha_qualifies(m["symbol"])]
-        alpha_poor = [m for m in buy_candidates if not _alpha_qualifies(m["symbol"])]
+        # 每個候選的 alpha 判定只算一次，分組與 ADD 理由共用
+        alpha_ok = {m["symbol"]: _alpha_qualifies(m["symbol"]) for m in buy_candidates}
+        alpha_good = [m for m in buy_candidates if alpha_ok[m["symbol"]]]
+        alpha_poor = [m for m in buy_candidates if not alpha_ok[m["symbol"]]]
 
         ADD_BACKUP = 3
         TARGET_PRIMARY = 5
@@ -278,15 +396,14 @@ def generate_actions(portfolio, current_prices, ma200_prices=None, momentum_rank
         ][:ADD_BACKUP]
 
         # === 金字塔加碼候選（持倉中可加碼的） ===
-        exit_symbols_set = {a["symbol"] for a in actions if a["action"] == "EXIT"}
         pyramid_candidates = []
         for sym, p in positions.items():
-            if p.get("core") or sym in exit_symbols_set:
+            if p.get("core") or sym in exit_symbols:
                 continue
             _ensure_tranches(p)
             if len(p["tranches"]) >= MAX_PYRAMID:
                 continue
-            mom = momentum_map.get(sym, {}).get("momentum")
+            mom = sym_momentum.get(sym)
             if mom is None or mom <= 0:
                 continue
             price_sym = current_prices.get(sym, 0)
@@ -305,8 +422,8 @@ def generate_actions(portfolio, current_prices, ma200_prices=None, momentum_rank
                 "current_tranche_count": len(p["tranches"]),
                 "rank": momentum_map.get(sym, {}).get("rank"),
             })
-        pyramid_candidates.sort(key=lambda x: x["momentum"], reverse=True)
-        pyramid_show = pyramid_candidates[:MAX_PYRAMID_SHOW]
+        # 只需動能最高的前 MAX_PYRAMID_SHOW 名，不必整串排序
+        pyramid_show = heapq.nlargest(MAX_PYRAMID_SHOW, pyramid_candidates, key=_get_momentum)
 
         # 計算 position_size：新倉 + 金字塔共用等額分配
         total_buying_slots = num_to_add + len(pyramid_show)
@@ -327,24 +444,19 @@ def generate_actions(portfolio, current_prices, ma200_prices=None, momentum_rank
             alpha_1y = alpha_1y_map.get(symbol)
             alpha_3y = alpha_3y_map.get(symbol)
 
-            if price > 0 and position_size > 0:
-                suggested_shares = math.floor(position_size / price)
-            else:
-                suggested_shares = 0
+            suggested_shares = _affordable_shares(position_size, price)
 
             # 組裝原因（加入警示）
             reason = f"動能排名 #{rank}（+{momentum:.1f}%）"
             if is_backup:
                 reason = f"[備選] {reason}"
-            is_supplemented = not _alpha_qualifies(symbol)
+            is_supplemented = not alpha_ok[symbol]
             if not is_backup and is_supplemented:
                 reason += " ⚠️ 補位（alpha 不符主清單標準）"
             if suggested_shares == 0 and not is_backup:
                 reason += "（現金不足）"
-            if rsi is not None and rsi > RSI_EXTREME:
-                reason += f" 🔴 RSI {rsi:.0f} 極度超買"
-            elif rsi is not None and rsi > RSI_OVERBOUGHT:
-                reason += f" 🟡 RSI {rsi:.0f} 超買"
+            if rsi is not None and rsi > RSI_OVERBOUGHT:
+                reason += _rsi_warning(rsi)
             if alpha_1y is not None and alpha_1y < -20:
                 reason += f" ⚠️ 1年落後大盤 {alpha_1y:.0f}%"
 
@@ -372,7 +484,7 @@ def generate_actions(portfolio, current_prices, ma200_prices=None, momentum_rank
             price = current_prices.get(sym, 0)
             stop_params = TRANCHE_PARAMS[pc["stop_type"]]
             direction_arrow = "↑" if pc["direction"] == "up" else "↓"
-            suggested_shares = math.floor(position_size / price) if price > 0 and position_size > 0 else 0
+            suggested_shares = _affordable_shares(position_size, price)
             if pc["direction"] == "up":
                 reason = (f"[持倉{direction_arrow}第{pc['tranche_n']}批] "
                           f"動能 +{pc['momentum']:.1f}%  "
@@ -381,10 +493,8 @@ def generate_actions(portfolio, current_prices, ma200_prices=None, momentum_rank
                 reason = (f"[持倉{direction_arrow}第{pc['tranche_n']}批] "
                           f"動能 +{pc['momentum']:.1f}%  撿便宜加碼（標準停損）")
             rsi = momentum_map.get(sym, {}).get("rsi")
-            if rsi is not None and rsi > RSI_EXTREME:
-                reason += f" 🔴 RSI {rsi:.0f} 極度超買"
-            elif rsi is not None and rsi > RSI_OVERBOUGHT:
-                reason += f" 🟡 RSI {rsi:.0f} 超買"
+            if rsi is not None and rsi > RSI_OVERBOUGHT:
+                reason += _rsi_warning(rsi)
             actions.append({
                 "id": action_id,
                 "action": "ADD",
@@ -407,122 +517,84 @@ def generate_actions(portfolio, current_prices, ma200_prices=None, momentum_rank
             })
 
     # === 4. 汰弱留強：主動建議換股（不限於現金不足） ===
-    # 找出持倉中動能最弱的非核心、非偏愛股票
-    exit_symbols = {a["symbol"] for a in actions if a["action"] == "EXIT"}
-    today = date.today()
-
-    def get_holding_days(pos):
-        """計算持有天數"""
-        first_entry = pos.get("first_entry")
-        if first_entry:
-            try:
-                entry_date = date.fromisoformat(first_entry)
-                return (today - entry_date).days
-            except ValueError:
-                return 999
-        # 沒有 first_entry 時，從 tranches 推算
-        tranches = pos.get("tranches", [])
-        if tranches:
-            try:
-                earliest = min(t["entry_date"] for t in tranches if t.get("entry_date"))
-                return (today - date.fromisoformat(earliest[:10])).days
-            except (ValueError, KeyError):
-                pass
-        return 999
-
-    def any_tranche_in_protection(pos):
-        """任一批次仍在保護期內，則整個持倉不可 ROTATE"""
-        from src.risk import TRANCHE_PARAMS
-        for t in pos.get("tranches", []):
-            try:
-                entry_dt = date.fromisoformat(t["entry_date"][:10])
-                days_held = (today - entry_dt).days
-                protect = TRANCHE_PARAMS.get(t.get("stop_type", "standard"), TRANCHE_PARAMS["standard"])["protect"]
-                if days_held < protect:
-                    return True
-            except (ValueError, KeyError):
-                pass
-        return False
-
-    # 可換股的持倉：排除核心、偏愛、已出場、保護期內、轉強中
-    rotatable_positions = [
-        (sym, pos, momentum_map.get(sym, {}).get("momentum"), get_holding_days(pos))
-        for sym, pos in positions.items()
-        if not pos.get("core", False)
-        and not pos.get("favorite", False)  # 排除偏愛標的
-        and sym not in exit_symbols
-        and momentum_map.get(sym, {}).get("momentum") is not None
-        and get_holding_days(pos) >= ROTATE_HOLDING_DAYS_MIN
-        and not any_tranche_in_protection(pos)   # 任一批次在保護期內，不建議 ROTATE
-        and trend_state_map.get(sym, {}).get("state") != "轉強"  # 轉強中不換，動能即將回升
-    ]
-
-    # 按動能排序（最弱的在前）
-    rotatable_positions.sort(key=lambda x: x[2] if x[2] is not None else 999)
+    # 找出持倉中動能最弱的非核心、非偏愛股票（rotatable_positions 已於第 2 節收集）
+    # 按動能排序（最弱的在前；動能為 None 者已排除）
+    rotatable_positions.sort(key=itemgetter(2))
 
     # 找出所有強勢候選（不只是現金不足的）：同樣套用 alpha 過濾，排除結構衰退標的
-    strong_candidates = [
-        m for m in momentum_ranks
-        if m.get("momentum", 0) > 0
-        and m["symbol"] not in positions
-        and m["symbol"] not in exit_symbols
-        and _alpha_qualifies(m["symbol"])
-    ]
+    # 沒有可換股的持倉時不必篩選
+    strong_candidates = []
+    if rotatable_positions:
+        strong_candidates = [
+            m for m in momentum_ranks
+            if _get_momentum(m) > 0
+            and m["symbol"] not in positions
+            and m["symbol"] not in exit_symbols
+            and _alpha_qualifies(m["symbol"])
+        ]
+        # 動能由高到低（rank_by_momentum 已排序，穩定排序不改變同分順序）
+        strong_candidates.sort(key=_get_momentum, reverse=True)
 
     # 對每個弱勢持倉，檢查是否有夠強的候選可換
-    rotate_used_candidates = set()  # 已被配對的候選
+    # 持倉動能由低到高、候選動能由高到低：動能差一旦不足即可停止往下找
+    used_mask = 0  # 已被配對的候選：第 j 位元代表 strong_candidates[j]
+    rotates = []
+    first_free = 0  # 第一個尚未被配對的候選位置
     for sym, pos, pos_momentum, holding_days in rotatable_positions:
         pos_price = current_prices.get(sym, 0)
         if pos_price <= 0:
             continue
+        pos_shares = pos["shares"]
+        rotate_budget = pos_price * pos_shares * CASH_SAFETY_FACTOR
+
+        while first_free < len(strong_candidates) and used_mask >> first_free & 1:
+            first_free += 1
 
         # 找一個還沒被配對的強勢候選
-        for candidate in strong_candidates:
-            if candidate["symbol"] in rotate_used_candidates:
+        for j in range(first_free, len(strong_candidates)):
+            candidate = strong_candidates[j]
+            if used_mask >> j & 1:
                 continue
 
-            candidate_momentum = candidate.get("momentum", 0)
+            candidate_momentum = _get_momentum(candidate)
             candidate_symbol = candidate["symbol"]
             candidate_price = current_prices.get(candidate_symbol, 0)
 
             # 條件：候選動能 - 持倉動能 > 門檻
             momentum_diff = candidate_momentum - (pos_momentum or 0)
-            if momentum_diff > ROTATE_MOMENTUM_DIFF:
-                pos_value = pos_price * pos["shares"]
-
-                # 計算換股後可買幾股
-                if candidate_price > 0:
-                    new_shares = math.floor(pos_value * CASH_SAFETY_FACTOR / candidate_price)
-                else:
-                    new_shares = 0
-
-                if new_shares > 0:
-                    action_id += 1
-                    actions.append({
-                        "id": action_id,
-                        "action": "ROTATE",
-                        "sell_symbol": sym,
-                        "sell_shares": pos["shares"],
-                        "sell_price": pos_price,
-                        "sell_momentum": pos_momentum,
-                        "sell_pnl_pct": round((pos_price - pos["avg_price"]) / pos["avg_price"] * 100, 2) if pos["avg_price"] > 0 else None,
-                        "sell_holding_days": holding_days,
-                        "buy_symbol": candidate_symbol,
-                        "buy_shares": new_shares,
-                        "buy_price": candidate_price,
-                        "buy_momentum": candidate_momentum,
-                        "buy_alpha_1y": alpha_1y_map.get(candidate_symbol),
-                        "buy_alpha_3y": alpha_3y_map.get(candidate_symbol),
-                        "momentum_diff": round(momentum_diff, 1),
-                        "reason": f"汰弱留強：動能差 +{momentum_diff:.0f}%（持有 {holding_days} 天）",
-                        "source": "rotate",
-                        "status": "pending",
-                    })
-                    rotate_used_candidates.add(candidate_symbol)
-                    break  # 這個持倉已配對，換下一個
+            if momentum_diff <= ROTATE_MOMENTUM_DIFF:
+                break  # 後面的候選動能更低，不可能再超過門檻
+
+            # 計算換股後可買幾股
+            new_shares = _affordable_shares(rotate_budget, candidate_price)
+
+            if new_shares > 0:
+                action_id += 1
+                rotates.append({
+                    "id": action_id,
+                    "action": "ROTATE",
+                    "sell_symbol": sym,
+                    "sell_shares": pos_shares,
+                    "sell_price": pos_price,
+                    "sell_momentum": pos_momentum,
+                    "sell_pnl_pct": pnl_map[sym],
+                    "sell_holding_days": holding_days,
+                    "buy_symbol": candidate_symbol,
+                    "buy_shares": new_shares,
+                    "buy_price": candidate_price,
+                    "buy_momentum": candidate_momentum,
+                    "buy_alpha_1y": alpha_1y_map.get(candidate_symbol),
+                    "buy_alpha_3y": alpha_3y_map.get(candidate_symbol),
+                    "momentum_diff": round(momentum_diff, 1),
+                    "reason": f"汰弱留強：動能差 +{momentum_diff:.0f}%（持有 {holding_days} 天）",
+                    "source": "rotate",
+                    "status": "pending",
+                })
+                actions.append(rotates[-1])
+                used_mask |= 1 << j
+                break  # 這個持倉已配對，換下一個
 
     # === 5. 計算 ROTATE 後的 ADD 股數（供參考） ===
-    rotates = [a for a in actions if a["action"] == "ROTATE"]
     if rotates and num_to_add > 0:
         rotate_proceeds = sum(
             a["sell_shares"] * a["sell_price"] * CASH_SAFETY_FACTOR
@@ -533,6 +605,6 @@ def generate_actions(portfolio, current_prices, ma200_prices=None, momentum_rank
             if a["action"] == "ADD":
                 price = a.get("current_price", 0)
                 if price > 0:
-                    a["suggested_shares_post_rotate"] = math.floor(post_rotate_position_size / price)
+                    a["suggested_shares_post_rotate"] = _affordable_shares(post_rotate_position_size, price)
 
     return actions
@@ -1,7 +1,8 @@
 import json
 import os
-from datetime import date as _date, timedelta
-from src.portfolio import _ensure_tranches
+from datetime import date as _date
+from functools import lru_cache
+from src.portfolio import _ensure_tranches, get_individual_count
 
 TRANCHE_PARAMS = {
     "standard": {"fixed": -0.15, "trailing": -0.25, "protect": 30},
@@ -9,6 +10,13 @@ TRANCHE_PARAMS = {
     "tight_3":  {"fixed": -0.07, "trailing": -0.10, "protect":  7},
 }
 
+
+@lru_cache(maxsize=4096)
+def _parse_date(text):
+    """解析 ISO 日期字串（批次進場日每天重複出現，快取解析結果）"""
+    return _date.fromisoformat(text)
+
+
 # 波動率分層停損（回測驗證：_vol_stop_backtest.py + _vol_stop_sensitivity.py）
 # 中層 -16%/-24%：停損率 46% 但每次損失更淺（-12.5%），存活者品質更高（+24.7%）
 # Calmar 12.845 vs -22% 的 11.391；MDD -31.2% vs -38.3%
@@ -31,6 +39,12 @@ def vol_adjusted_stops(stop_type: str, vol: float | None) -> tuple[float, float]
     else:
         return 0.25, 0.35   # 高波動（>60%）：寬停損避免雜訊
 
+# 出場原因代碼（寫入 EXIT action 的 source，各檢查共用同一組常數）
+REASON_FIXED_STOP    = "fixed_stop"
+REASON_TRAILING_STOP = "trailing_stop"
+REASON_MA200_STOP    = "ma200_stop"
+REASON_EXTREME_STOP  = "extreme_stop"
+
 # 動態收緊追蹤停損：獲利達 +25% 時，把追蹤停損從原始值收緊
 # 回測顯示：Calmar 0.516 → 0.620（+0.104），優於分批停利
 TIGHTEN_THRESHOLD = 0.25
@@ -41,35 +55,54 @@ TIGHTEN_MAP = {
 }
 
 
-def check_stop_loss(positions, current_prices, threshold=-0.35):
+def get_core_symbols(positions):
+    """核心持倉代碼集合：同一批持倉要跑多個停損檢查時先算一次，以 core_symbols 傳入"""
+    return frozenset(s for s, pos in positions.items() if pos.get("core", False))
+
+
+def _priced_positions(positions, current_prices, core_symbols=None):
+    """逐一產出 (symbol, pos, price)：跳過核心持倉與無報價者，供各停損檢查共用
+
+    core_symbols 有傳入時以集合判斷核心持倉，否則逐檔讀 pos["core"]。
+    """
+    price_of = current_prices.get
+    for symbol, pos in positions.items():
+        if core_symbols is None:
+            if pos.get("core", False):
+                continue
+        elif symbol in core_symbols:
+            continue
+        price = price_of(symbol)
+        if price is None:
+            continue
+        yield symbol, pos, price
+
+
+def check_stop_loss(positions, current_prices, threshold=-0.35, core_symbols=None):
     """檢查持倉是否觸發極端停損（從成本價計算）
 
     Args:
         positions: 持倉 dict
         current_prices: {symbol: price}
         threshold: 停損閾值（預設 -35%）
+        core_symbols: get_core_symbols() 結果（選填）
 
     Returns:
         list of dict: [{"symbol": str, "pnl_pct": float}, ...]
     """
     triggered = []
-    for symbol, pos in positions.items():
-        if pos.get("core", False):
-            continue
-        price = current_prices.get(symbol)
-        if price is None:
-            continue
+    for symbol, pos, price in _priced_positions(positions, current_prices, core_symbols):
         pnl_pct = (price - pos["avg_price"]) / pos["avg_price"]
         if pnl_pct <= threshold:
             triggered.append({
                 "symbol": symbol,
-                "pnl_pct": round(pnl_pct * 100, 2),
-                "reason": "extreme_stop",
+                "pnl_pct": pnl_pct * 100,
+                "reason": REASON_EXTREME_STOP,
             })
     return triggered
 
 
-def check_fixed_stop(positions, current_prices, threshold=-0.15):
+def check_fixed_stop(positions, current_prices, threshold=-0.15, core_symbols=None):
     """檢查持倉是否觸發固定停損（從成本價計算）
 
     根據回測結果，Fixed -15% 優於 Trailing -15%：
@@ -81,35 +114,31 @@ def check_fixed_stop(positions, current_prices, threshold=-0.15):
         positions: 持倉 dict
         current_prices: {symbol: price}
         threshold: 停損閾值（預設 -15%）
+        core_symbols: get_core_symbols() 結果（選填）
 
     Returns:
         list of dict: [{"symbol": str, "pnl_pct": float, "stop_price": float}, ...]
     """
     triggered = []
-    for symbol, pos in positions.items():
-        if pos.get("core", False):
-            continue
-        price = current_prices.get(symbol)
+    for symbol, pos, price in _priced_positions(positions, current_prices, core_symbols):
         avg_price = pos.get("avg_price", 0)
-        if price is None or avg_price <= 0:
+        if avg_price <= 0:
             continue
 
         pnl_pct = (price - avg_price) / avg_price
-        stop_price = avg_price * (1 + threshold)
-
         if pnl_pct <= threshold:
             triggered.append({
                 "symbol": symbol,
-                "pnl_pct": round(pnl_pct * 100, 2),
+                "pnl_pct": pnl_pct * 100,
                 "avg_price": avg_price,
                 "current_price": price,
-                "stop_price": round(stop_price, 2),
-                "reason": "fixed_stop",
+                "stop_price": avg_price * (1 + threshold),  # 只有觸發時才需要
+                "reason": REASON_FIXED_STOP,
             })
     return triggered
 
 
-def check_trailing_stop(positions, current_prices, trailing_pct=0.25):
+def check_trailing_stop(positions, current_prices, trailing_pct=0.25, core_symbols=None):
     """檢查持倉是否觸發追蹤停損（從持倉最高點回落指定比例）
 
     回測驗證（10Y S&P500 全市場）：
@@ -121,58 +150,55 @@ def check_trailing_stop(positions, current_prices, trailing_pct=0.25):
         positions: 持倉 dict（每個 pos 需含 high_since_entry）
         current_prices: {symbol: price}
         trailing_pct: 從最高點回落觸發比例（預設 0.25 = -25%）
+        core_symbols: get_core_symbols() 結果（選填）
 
     Returns:
         list of dict: [{"symbol": str, "high_since_entry": float,
                         "current_price": float, "from_high_pct": float}, ...]
     """
     triggered = []
-    for symbol, pos in positions.items():
-        if pos.get("core", False):
-            continue
-        price = current_prices.get(symbol)
+    trigger_level = -trailing_pct
+    for symbol, pos, price in _priced_positions(positions, current_prices, core_symbols):
         high_price = pos.get("high_since_entry")
-        if price is None or high_price is None or high_price <= 0:
+        if high_price is None or high_price <= 0:
             continue
         from_high = (price - high_price) / high_price
-        if from_high <= -trailing_pct:
+        if from_high <= trigger_level:
             triggered.append({
                 "symbol": symbol,
                 "high_since_entry": high_price,
                 "current_price": price,
-                "from_high_pct": round(from_high * 100, 2),
-                "reason": "trailing_stop",
+                "from_high_pct": from_high * 100,
+                "reason": REASON_TRAILING_STOP,
             })
     return triggered
 
 
-def check_ma200_stop(positions, current_prices, ma200_prices):
+def check_ma200_stop(positions, current_prices, ma200_prices, core_symbols=None):
     """檢查持倉是否跌破 MA200
 
     Args:
         positions: 持倉 dict
         current_prices: {symbol: price}
         ma200_prices: {symbol: ma200_value}
+        core_symbols: get_core_symbols() 結果（選填）
 
     Returns:
         list of dict: [{"symbol": str, "ma200": float, "current_price": float}, ...]
     """
     triggered = []
-    for symbol, pos in positions.items():
-        if pos.get("core", False):
-            continue
-        price = current_prices.get(symbol)
+    for symbol, pos, price in _priced_positions(positions, current_prices, core_symbols):
         ma200 = ma200_prices.get(symbol)
-        if price is None or ma200 is None:
+        if ma200 is None:
             continue
 
         if price < ma200:
             triggered.append({
                 "symbol": symbol,
-                "ma200": round(ma200, 2),
+                "ma200": ma200,
                 "current_price": price,
-                "below_pct": round((price - ma200) / ma200 * 100, 2),
-                "reason": "ma200_stop",
+                "below_pct": (price - ma200) / ma200 * 100,
+                "reason": REASON_MA200_STOP,
             })
     return triggered
 
@@ -214,12 +240,15 @@ def check_all_exit_conditions(positions, current_prices, ma200_prices,
         exits:   {symbol: [tranche_exit, ...]}   — 確認出場（立即執行）
         pending: {symbol: [tranche_pending, ...]} — 首日觸發待確認（明日觀察）
         每個 symbol 的列表按 tranche_n 降序排列（先出最新批次）
+        各項為一般 dict：pending 會原樣寫入 actions 的 stop_pending 並存成 JSON
     """
     today     = _date.today()
     today_str = str(today)
     vix_mult  = _vix_multiplier(vix or 20.0)
     exits     = {}
     pending   = {}
+    volumes   = volumes or {}
+    vol_map   = vol_map or {}
 
     for symbol, pos in positions.items():
         if pos.get("core", False):
@@ -229,17 +258,19 @@ def check_all_exit_conditions(positions, current_prices, ma200_prices,
             continue
 
         _ensure_tranches(pos)
-        sym_exits   = []
-        sym_pending = []
 
         # 成交量資料
-        vol_data  = (volumes or {}).get(symbol, {})
+        vol_data  = volumes.get(symbol, {})
         vol       = vol_data.get("volume", 0)
         vol_ma    = vol_data.get("vol_ma20", 0)
         low_vol   = vol_ma > 0 and vol < vol_ma * VOL_CONFIRM_RATIO
-        vol_ratio = round(vol / vol_ma, 2) if vol_ma > 0 else None
 
-        sym_vol = (vol_map or {}).get(symbol)  # 年化波動率（可能為 None）
+        sym_vol = vol_map.get(symbol)  # 年化波動率（可能為 None）
+        ma200   = ma200_prices.get(symbol)
+        below_ma200 = ma200 is not None and price < ma200  # 逐檔判斷一次，各 standard 批次共用
+        # 持倉損益（極端停損用）每檔只算一次
+        pos_avg = pos.get("avg_price")
+        pos_pnl = (price - pos_avg) / pos_avg if pos_avg is not None and pos_avg > 0 else None
 
         for t in pos["tranches"]:
             stop_type = t.get("stop_type", "standard")
@@ -247,7 +278,7 @@ def check_all_exit_conditions(positions, current_prices, ma200_prices,
 
             # 保護期檢查
             try:
-                entry_date = _date.fromisoformat(t["entry_date"])
+                entry_date = _parse_date(t["entry_date"])
                 days_held  = (today - entry_date).days
             except (ValueError, KeyError):
                 days_held  = 999
@@ -283,33 +314,34 @@ def check_all_exit_conditions(positions, current_prices, ma200_prices,
                     t.pop("stop_pending_since", None)
                 # 3. MA200 停損（不做兩日確認）
                 if stop_type == "standard":
-                    ma200 = ma200_prices.get(symbol)
-                    if ma200 is not None and price < ma200:
-                        sym_exits.append({
+                    if below_ma200:
+                        exits.setdefault(symbol, []).append({
                             "tranche_n":      n,
                             "tranche_shares": t_shares,
-                            "reason":         "ma200_stop",
+                            "reason":         REASON_MA200_STOP,
                             "message":        f"跌破 MA200（第{n}批，MA200 ${ma200:.2f}，{(price-ma200)/ma200*100:.1f}%）",
                             "details":        {"ma200": ma200, "current_price": price},
                         })
                         continue
-                    # 4. 極端停損（-35%，不做兩日確認）
-                    avg_price = pos.get("avg_price", entry_price)
-                    if avg_price > 0:
-                        pnl_pct = (price - avg_price) / avg_price
-                        if pnl_pct <= hard_threshold:
-                            sym_exits.append({
-                                "tranche_n":      n,
-                                "tranche_shares": t_shares,
-                                "reason":         "extreme_stop",
-                                "message":        f"極端停損觸發（第{n}批，從成本 {pnl_pct*100:.1f}%）",
-                                "details":        {"avg_price": avg_price, "pnl_pct": pnl_pct, "current_price": price},
-                            })
+                    # 4. 極端停損（-35%，不做兩日確認）；無持倉均價時以批次成本計算
+                    if pos_avg is not None:
+                        avg_price, pnl_pct = pos_avg, pos_pnl
+                    else:
+                        avg_price = entry_price
+                        pnl_pct = (price - avg_price) / avg_price if avg_price > 0 else None
+                    if pnl_pct is not None and pnl_pct <= hard_threshold:
+                        exits.setdefault(symbol, []).append({
+                            "tranche_n":      n,
+                            "tranche_shares": t_shares,
+                            "reason":         REASON_EXTREME_STOP,
+                            "message":        f"極端停損觸發（第{n}批，從成本 {pnl_pct*100:.1f}%）",
+                            "details":        {"avg_price": avg_price, "pnl_pct": pnl_pct, "current_price": price},
+                        })
                 continue
 
             # ── 固定/追蹤停損觸發（應用兩日確認）────────────────────────
             if fixed_hit:
-                reason  = "fixed_stop"
+                reason  = REASON_FIXED_STOP
                 vix_tag = f"（VIX={vix:.0f}，展寬至 {eff_fixed_dist*100:.0f}%）" if vix_mult > 1 else ""
                 msg     = (f"固定停損觸發{vix_tag}（第{n}批，成本 ${entry_price:.2f}，"
                            f"停損 ${fixed_stop_price:.2f}，目前 {(price-entry_price)/entry_price*100:.1f}%）")
@@ -317,7 +349,7 @@ def check_all_exit_conditions(positions, current_prices, ma200_prices,
                            "current_price": price, "vix_mult": vix_mult}
             else:
                 from_high = (price - t_high) / t_high
-                reason  = "trailing_stop"
+                reason  = REASON_TRAILING_STOP
                 vix_tag = f"（VIX={vix:.0f}，展寬至 {eff_trail_dist*100:.0f}%）" if vix_mult > 1 else ""
                 msg     = (f"追蹤停損觸發{vix_tag}（第{n}批，最高 ${t_high:.2f}，"
                            f"回落 {from_high*100:.1f}%）")
@@ -336,22 +368,21 @@ def check_all_exit_conditions(positions, current_prices, ma200_prices,
             if pending_since and pending_since < today_str:
                 # 第二日確認（非同日重跑）→ 真正出場
                 t.pop("stop_pending_since", None)
-                sym_exits.append(item)
+                exits.setdefault(symbol, []).append(item)
             else:
                 # 第一日（或同日重跑）→ 設待確認
                 t["stop_pending_since"] = today_str
                 notice = dict(item)
                 notice["pending_reason"] = "low_volume" if low_vol else "two_day_confirm"
-                notice["vol_ratio"]      = vol_ratio
+                notice["vol_ratio"]      = round(vol / vol_ma, 2) if vol_ma > 0 else None
                 notice["vix_mult"]       = vix_mult
-                sym_pending.append(notice)
+                pending.setdefault(symbol, []).append(notice)
 
-        if sym_exits:
-            sym_exits.sort(key=lambda x: x["tranche_n"], reverse=True)
-            exits[symbol] = sym_exits
-        if sym_pending:
-            sym_pending.sort(key=lambda x: x["tranche_n"], reverse=True)
-            pending[symbol] = sym_pending
+        # 大多數標的沒有觸發，只有實際寫入結果的才需要排序
+        if symbol in exits:
+            exits[symbol].sort(key=lambda x: x["tranche_n"], reverse=True)
+        if symbol in pending:
+            pending[symbol].sort(key=lambda x: x["tranche_n"], reverse=True)
 
     return exits, pending
 
@@ -578,8 +609,4 @@ def confirm_winner_cycle_reentry(symbol):
 
 def check_position_limit(portfolio, max_stocks=30):
     """回傳還能買幾檔個股"""
-    individual_count = sum(
-        1 for pos in portfolio["positions"].values()
-        if not pos.get("core", False)
-    )
-    return max(max_stocks - individual_count, 0)
+    return max(max_stocks - get_individual_count(portfolio), 0)
@@ -3,9 +3,13 @@
 追蹤科技相關板塊 vs 大盤的相對表現，
 當板塊明顯跑輸時發出警告。
 """
+import json
+import os
+import time
 import yfinance as yf
 import pandas as pd
-from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta
 
 
 # 監控的板塊 ETF
@@ -20,9 +24,63 @@ SECTOR_ETFS = {
 
 BENCHMARK = "SPY"
 
+# 持股板塊分類：代碼（大寫）→ 板塊，模組載入時建好一次（可之後擴展其他板塊）
+TECH_SECTOR = "科技"
+SYMBOL_TO_SECTOR = {
+    symbol: TECH_SECTOR
+    for symbol in ("NVDA", "SHOP", "GOOG", "GOOGL", "TSLA", "MU", "DASH", "ZG",
+                   "AAPL", "MSFT", "META", "AMZN", "AMD", "INTC", "CRM", "ADBE")
+}
+
 # 警告門檻：相對強弱低於此值時警告
 ALERT_THRESHOLD = -0.05  # -5%
 
+# 報酬快取：同一天內短時間重跑（或同一輪多次呼叫）不重複抓網路
+_CACHE_PREFIX = "data/_sector_returns_"
+CACHE_TTL_SECONDS = 15 * 60  # 15 分鐘
+
+
+def _cache_path(lookback_days):
+    return f"{_CACHE_PREFIX}{date.today()}_{lookback_days}d.json"
+
+
+def _load_cached_returns(lookback_days):
+    """讀取未過期的板塊報酬快取，沒有或已過期回傳 None"""
+    path = _cache_path(lookback_days)
+    try:
+        if time.time() - os.path.getmtime(path) > CACHE_TTL_SECONDS:
+            return None
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, json.JSONDecodeError):
+        return None
+
+
+def _save_cached_returns(lookback_days, results):
+    try:
+        os.makedirs("data", exist_ok=True)
+        with open(_cache_path(lookback_days), "w", encoding="utf-8") as f:
+            json.dump(results, f, ensure_ascii=False)
+    except OSError:
+        return
+    _purge_stale_caches()
+
+
+def _purge_stale_caches():
+    """刪除非今日的板塊報酬快取，避免 data/ 每天累積一個檔案"""
+    cache_dir, prefix = os.path.split(_CACHE_PREFIX)
+    today_prefix = f"{prefix}{date.today()}_"
+    try:
+        names = os.listdir(cache_dir)
+    except OSError:
+        return
+    for name in names:
+        if name.startswith(prefix) and not name.startswith(today_prefix):
+            try:
+                os.remove(os.path.join(cache_dir, name))
+            except OSError:
+                pass
+
 
 def fetch_sector_returns(lookback_days=5):
     """取得板塊和大盤的近期報酬
@@ -33,10 +91,21 @@ def fetch_sector_returns(lookback_days=5):
     Returns:
         dict: {symbol: {"name": str, "return": float, "relative": float}}
     """
+    cached = _load_cached_returns(lookback_days)
+    if cached is not None:
+        return cached
+
     results = {}
+    symbols = [BENCHMARK] + list(SECTOR_ETFS)
+    close = _fetch_closes(symbols, lookback_days)
+    if close is None:
+        close = _fetch_closes_parallel(symbols, lookback_days)
+    if close is None:
+        return {}
 
     # 取得基準報酬
-    benchmark_ret = _get_return(BENCHMARK, lookback_days)
+    returns = _compute_returns(close, lookback_days)
+    benchmark_ret = returns.get(BENCHMARK)
     if benchmark_ret is None:
         return {}
 
@@ -48,7 +117,7 @@ def fetch_sector_returns(lookback_days=5):
 
     # 取得各板塊報酬
     for symbol, name in SECTOR_ETFS.items():
-        ret = _get_return(symbol, lookback_days)
+        ret = returns.get(symbol)
         if ret is not None:
             results[symbol] = {
                 "name": name,
@@ -56,31 +125,72 @@ def fetch_sector_returns(lookback_days=5):
                 "relative": ret - benchmark_ret,
             }
 
+    _save_cached_returns(lookback_days, results)
     return results
 
 
-def _get_return(symbol, days):
-    """取得單一標的的近期報酬"""
+def _fetch_closes(symbols, days):
+    """一次批次下載多檔收盤價（單一請求，取代逐檔 Ticker.history）
+
+    Returns:
+        DataFrame: index 為日期、columns 為 symbol；失敗回傳 None
+    """
     try:
         # 多抓幾天確保有足夠交易日
-        df = yf.Ticker(symbol).history(period=f"{days + 10}d")
-        if df.empty or len(df) < days:
+        raw = yf.download(symbols, period=f"{days + 10}d", auto_adjust=True, progress=False)
+        if raw.empty:
             return None
-
-        df = df.tail(days + 1)  # +1 因為要算 pct change
-        ret = (df['Close'].iloc[-1] / df['Close'].iloc[0] - 1)
-        return round(ret, 4)
+        return raw["Close"]
     except Exception:
         return None
 
 
-def get_sector_alerts(lookback_days=5, threshold=ALERT_THRESHOLD):
+def _fetch_closes_parallel(symbols, days):
+    """批次下載失敗時的備援：逐檔 Ticker.history 以執行緒並行抓取
+
+    Returns:
+        DataFrame: 同 _fetch_closes；全部失敗回傳 None
+    """
+    def _history_close(symbol):
+        try:
+            df = yf.Ticker(symbol).history(period=f"{days + 10}d")
+            return None if df.empty else df["Close"]
+        except Exception:
+            return None
+
+    with ThreadPoolExecutor(max_workers=len(symbols)) as executor:
+        closes = dict(zip(symbols, executor.map(_history_close, symbols)))
+    closes = {s: c for s, c in closes.items() if c is not None}
+    return pd.DataFrame(closes) if closes else None
+
+
+def _compute_returns(close, days):
+    """由批次收盤價一次計算所有標的的近期報酬
+
+    Returns:
+        dict: {symbol: return}；有效交易日不足 days 的標的不列入
+    """
+    enough = close.count() >= days
+    window = close.ffill().tail(days + 1)  # +1 因為要算 pct change
+    rets = (window.iloc[-1] / window.iloc[0] - 1).round(4)
+    return {
+        symbol: float(ret)
+        for symbol, ret in rets.items()
+        if enough[symbol] and pd.notna(ret)
+    }
+
+
+def get_sector_alerts(lookback_days=5, threshold=ALERT_THRESHOLD, sector_data=None):
     """取得板塊警告
 
+    Args:
+        sector_data: 已取得的 fetch_sector_returns() 結果；None 時自行抓取
+
     Returns:
         alerts: list of dict，每個 dict 含 symbol, name, return, relative, message
     """
-    sector_data = fetch_sector_returns(lookback_days)
+    if sector_data is None:
+        sector_data = fetch_sector_returns(lookback_days)
     alerts = []
 
     for symbol, data in sector_data.items():
@@ -109,7 +219,7 @@ def get_sector_summary(lookback_days=5):
         summary: dict 含 benchmark, sectors, alerts, status
     """
     sector_data = fetch_sector_returns(lookback_days)
-    alerts = get_sector_alerts(lookback_days)
+    alerts = get_sector_alerts(lookback_days, sector_data=sector_data)
 
     # 判斷整體狀態
     if not sector_data:
@@ -169,14 +279,13 @@ def check_holdings_sector_exposure(holdings, lookback_days=5):
         holdings: list of symbol
 
     Returns:
-        dict: 含 tech_heavy, alerts 等資訊
+        dict: 含 tech_heavy, alerts, sector_counts（各板塊持股數，未分類為 "其他"）等資訊
     """
-    # 簡單分類（可以之後擴展）
-    tech_related = {"NVDA", "SHOP", "GOOG", "GOOGL", "TSLA", "MU", "DASH", "ZG",
-                    "AAPL", "MSFT", "META", "AMZN", "AMD", "INTC", "CRM", "ADBE"}
-
-    holdings_upper = {s.upper() for s in holdings}
-    tech_holdings = holdings_upper & tech_related
+    # 單趟查表完成分類
+    sector_holdings = {}
+    for symbol in {s.upper() for s in holdings}:
+        sector_holdings.setdefault(SYMBOL_TO_SECTOR.get(symbol, "其他"), set()).add(symbol)
+    tech_holdings = sector_holdings.get(TECH_SECTOR, set())
     tech_ratio = len(tech_holdings) / len(holdings) if holdings else 0
 
     # 取得板塊警告
@@ -189,6 +298,7 @@ def check_holdings_sector_exposure(holdings, lookback_days=5):
         "is_tech_heavy": tech_ratio > 0.5,
         "tech_alerts": tech_alerts,
         "warning": tech_ratio > 0.5 and len(tech_alerts) > 0,
+        "sector_counts": {sector: len(syms) for sector, syms in sector_holdings.items()},
     }
 
 
@@ -4,9 +4,14 @@
 """
 import json
 import os
-from datetime import date
+from datetime import date, timedelta
 import yfinance as yf
 
+try:
+    import orjson  # 選用：C 實作解析較快，未安裝時退回標準 json
+except ImportError:
+    orjson = None
+
 SNAPSHOT_DIR = "data"
 
 
@@ -25,14 +30,21 @@ def load_snapshot(year: int) -> dict | None:
     if not os.path.exists(path):
         return None
 
-    with open(path, "r", encoding="utf-8") as f:
-        return json.load(f)
+    with open(path, "rb") as f:
+        data = f.read()
+    if orjson is not None:
+        try:
+            return orjson.loads(data)
+        except orjson.JSONDecodeError:
+            pass  # 含 NaN 等 orjson 不接受的標記時退回標準 json
+    return json.loads(data)
 
 
 def save_snapshot(snapshot: dict, year: int):
     """儲存年度快照"""
     os.makedirs(SNAPSHOT_DIR, exist_ok=True)
     path = get_snapshot_path(year)
+    # 寫入固定用標準 json：orjson 會把 NaN 寫成 null、浮點格式也不同
     with open(path, "w", encoding="utf-8") as f:
         json.dump(snapshot, f, indent=2, ensure_ascii=False)
     return path
@@ -49,7 +61,30 @@ def fetch_historical_prices(symbols: list, target_date: str) -> dict:
         dict: {symbol: price}
     """
     prices = {}
+    if not symbols:
+        return prices
+
+    # 一次批次下載所有標的（單一請求，取代逐檔 Ticker.history）
+    end_date = (date.fromisoformat(target_date) + timedelta(days=7)).isoformat()
+    try:
+        raw = yf.download(list(symbols), start=target_date, end=end_date,
+                          auto_adjust=True, progress=False)
+        close = raw["Close"]
+        if not hasattr(close, "columns"):
+            # 單檔回傳 Series
+            close = close.to_frame(symbols[0])
+        for symbol in symbols:
+            if symbol in close.columns:
+                s = close[symbol].dropna()
+                if not s.empty:
+                    prices[symbol] = round(float(s.iloc[0]), 2)
+    except Exception:
+        pass
+
+    # 批次結果缺漏的標的逐檔補抓
     for symbol in symbols:
+        if symbol in prices:
+            continue
         try:
             ticker = yf.Ticker(symbol)
             # 取得目標日期前後的資料
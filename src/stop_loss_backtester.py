@@ -1,39 +1,59 @@
+import os
+
 import numpy as np
-import pandas as pd
 
+# numba 磁碟快取放在 repo 內，CI 可跨次執行保留（需在 import numba 前設定）
+os.environ.setdefault(
+    "NUMBA_CACHE_DIR",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), ".numba_cache"),
+)
 
-def backtest_stop_loss_strategy(
-    df,
-    stop_loss_type=None,
-    threshold=-0.35,
-    entry_signal=None,
-    cooldown_days=1,
-):
-    """回測停損策略
+try:
+    from numba import njit, types  # 選用：JIT 編譯回測主迴圈，未安裝時以純 Python 執行
+
+    # 明確簽章：import 時即編譯（或讀磁碟快取），首次呼叫不再有 JIT 延遲；
+    # 輸入宣告為唯讀、連續（C layout）陣列：pandas to_numpy() 回傳的唯讀 view 可直接傳入，
+    # 連續記憶體讓迴圈不必處理 stride
+    _ro_float64 = types.Array(types.float64, 1, "C", readonly=True)
+    _BT_CORE_SIGNATURE = types.Tuple((
+        types.float64[:], types.float64[:], types.float64[:], types.boolean[:], types.int64,
+    ))(_ro_float64, types.boolean, _ro_float64, types.float64, types.int64, types.int64)
+    _METRICS_SIGNATURE = types.UniTuple(types.float64, 2)(_ro_float64, _ro_float64)
+    _HAS_NUMBA = True
+except ImportError:
+    _BT_CORE_SIGNATURE = None
+    _METRICS_SIGNATURE = None
+    _HAS_NUMBA = False
+
+    def njit(*args, **kwargs):
+        return lambda fn: fn
+
+
+# 停損類型代碼（numba 核心不吃字串）
+_SL_TYPE_CODES = {None: 0, "fixed": 1, "trailing": 2}
+
+
+@njit(_BT_CORE_SIGNATURE, cache=True, nogil=True)
+def _bt_core(close, sig_present, sig, threshold, sl_type_code, cooldown_days):
+    """逐日回測主迴圈（純陣列運算）
 
     Args:
-        df: DataFrame，需含 'Close' 欄位
-        stop_loss_type: None (Buy & Hold), "fixed", or "trailing"
-        threshold: 停損門檻，如 -0.35 表示 -35%
-        entry_signal: Series 或 None。1=進場訊號，-1=出場訊號，0=無訊號
-                      若為 None，則採用 Buy & Hold（一開始就進場）
+        close: float64 收盤價陣列（純 Python 執行時可為 list）
+        sig_present: 是否有進出場訊號；False 時採 Buy & Hold
+        sig: 訊號陣列（1=進場，-1=出場），sig_present 為 False 時不使用
+        threshold: 停損門檻
+        sl_type_code: 0=不停損, 1=fixed, 2=trailing
         cooldown_days: 停損後等待 N 天才能重新進場
 
     Returns:
-        df_result: 含 Position, Strategy_Return, Cumulative 等欄位
-        metrics: dict 含 Return%, MDD%, Trade_Count, CAGR% 等
+        (position, entry_price, high_watermark, stop_loss_triggered, trade_count)
     """
-    df = df.copy()
-    n = len(df)
-
-    # 準備欄位
-    df['Daily_Return'] = df['Close'].pct_change().fillna(0)
+    n = len(close)
 
-    # 初始化
     position = np.zeros(n)         # 0 或 1
     entry_price = np.zeros(n)      # 進場價格
     high_watermark = np.zeros(n)   # 最高點（trailing 用）
-    stop_loss_triggered = np.zeros(n, dtype=bool)  # 是否觸發停損
+    stop_loss_triggered = np.zeros(n, dtype=np.bool_)  # 是否觸發停損
 
     in_position = False
     current_entry_price = 0.0
@@ -42,12 +62,12 @@ def backtest_stop_loss_strategy(
     trade_count = 0
 
     for i in range(n):
-        price = df['Close'].iloc[i]
+        price = close[i]
 
         # 判斷進場訊號
-        if entry_signal is not None:
-            want_enter = (entry_signal.iloc[i] == 1)
-            want_exit = (entry_signal.iloc[i] == -1)
+        if sig_present:
+            want_enter = (sig[i] == 1)
+            want_exit = (sig[i] == -1)
         else:
             # Buy & Hold: 第一天進場，之後維持
             want_enter = (i == 0) or (not in_position and cooldown_counter == 0)
@@ -70,13 +90,13 @@ def backtest_stop_loss_strategy(
 
         # 停損檢查
         triggered = False
-        if in_position and stop_loss_type is not None:
-            if stop_loss_type == "fixed":
+        if in_position and sl_type_code != 0:
+            if sl_type_code == 1:
                 # 從進場價計算
                 pnl = (price - current_entry_price) / current_entry_price
                 if pnl <= threshold:
                     triggered = True
-            elif stop_loss_type == "trailing":
+            elif sl_type_code == 2:
                 # 從最高點計算回撤
                 drawdown = (price - current_high) / current_high
                 if drawdown <= threshold:
@@ -94,34 +114,166 @@ def backtest_stop_loss_strategy(
         entry_price[i] = current_entry_price if in_position else 0
         high_watermark[i] = current_high if in_position else 0
 
-    # 計算報酬（position 需要 shift 1 避免 look-ahead bias）
-    df['Position'] = pd.Series(position, index=df.index).shift(1).fillna(0)
-    df['Entry_Price'] = pd.Series(entry_price, index=df.index)
-    df['High_Watermark'] = pd.Series(high_watermark, index=df.index)
-    df['Stop_Loss_Triggered'] = pd.Series(stop_loss_triggered, index=df.index)
+    return position, entry_price, high_watermark, stop_loss_triggered, trade_count
 
-    df['Strategy_Return'] = df['Daily_Return'] * df['Position']
-    df['Cumulative_Market'] = (1 + df['Daily_Return']).cumprod()
-    df['Cumulative_Strategy'] = (1 + df['Strategy_Return']).cumprod()
 
-    # 計算 metrics
-    final_return = (df['Cumulative_Strategy'].iloc[-1] - 1) * 100
-    market_return = (df['Cumulative_Market'].iloc[-1] - 1) * 100
+@njit(_METRICS_SIGNATURE, cache=True, nogil=True)
+def _strategy_metrics(daily_return, position_shifted):
+    """單次掃描同時算出策略累積報酬與最大回撤，不建立 cumprod / cummax 中間陣列
+
+    運算順序與 np.cumprod / np.maximum.accumulate 相同，結果逐位元一致。
+
+    Returns:
+        (最終累積報酬, 最大回撤比例)
+    """
+    cum = 1.0
+    peak = 0.0
+    mdd = 0.0
+    for i in range(daily_return.shape[0]):
+        cum *= 1 + daily_return[i] * position_shifted[i]
+        if i == 0 or cum > peak:
+            peak = cum
+        drawdown = (cum - peak) / peak
+        if drawdown < mdd:
+            mdd = drawdown
+    return cum, mdd
+
+
+def _bt_vectorized_buyhold(close, sl_type_code, threshold, cooldown_days):
+    """無進場訊號（Buy & Hold + 停損）的向量化版本，結果與 _bt_core 相同
+
+    每段持倉用 cummax / 進場價一次算出觸發遮罩，取第一個觸發點出場，
+    只在停損事件之間迴圈（通常 0~5 次）。
+    """
+    n = close.shape[0]
+    position = np.zeros(n)
+    entry_price = np.zeros(n)
+    high_watermark = np.zeros(n)
+    stop_loss_triggered = np.zeros(n, dtype=np.bool_)
+
+    trade_count = 0
+    start = 0
+    while start < n:
+        trade_count += 1
+        seg = close[start:]
+        cum_high = np.maximum.accumulate(seg)
+        if sl_type_code == 1:
+            mask = (seg - seg[0]) / seg[0] <= threshold
+        elif sl_type_code == 2:
+            mask = (seg - cum_high) / cum_high <= threshold
+        else:
+            mask = None
+
+        end = n
+        if mask is not None and mask.any():
+            end = start + int(mask.argmax())
+            stop_loss_triggered[end] = True
+
+        position[start:end] = 1
+        entry_price[start:end] = seg[0]
+        high_watermark[start:end] = cum_high[:end - start]
+
+        if end == n or cooldown_days < 0:
+            break
+        # 與 _bt_core 相同：停損日後第 cooldown_days + 1 天重新進場
+        start = end + cooldown_days + 1
 
-    # 最大回撤
-    cummax = df['Cumulative_Strategy'].cummax()
-    drawdown = (df['Cumulative_Strategy'] - cummax) / cummax
-    mdd = drawdown.min() * 100
+    return position, entry_price, high_watermark, stop_loss_triggered, trade_count
+
+
+def _daily_return(df):
+    """日報酬 ndarray；df 已有 Daily_Return 欄位（如 backtester.run_backtest 的結果）時直接沿用"""
+    if 'Daily_Return' in df.columns:
+        return df['Daily_Return'].to_numpy()
+    return df['Close'].pct_change().fillna(0).to_numpy()
+
+
+def backtest_stop_loss_strategy(
+    df,
+    stop_loss_type=None,
+    threshold=-0.35,
+    entry_signal=None,
+    cooldown_days=1,
+    daily_return=None,
+    cum_market=None,
+    return_df=True,
+):
+    """回測停損策略
+
+    Args:
+        df: DataFrame，需含 'Close' 欄位
+        stop_loss_type: None (Buy & Hold), "fixed", or "trailing"
+        threshold: 停損門檻，如 -0.35 表示 -35%
+        entry_signal: Series 或 None。1=進場訊號，-1=出場訊號，0=無訊號
+                      若為 None，則採用 Buy & Hold（一開始就進場）
+        cooldown_days: 停損後等待 N 天才能重新進場
+        daily_return: 預先算好的日報酬 ndarray（pct_change 後補 0）；None 時沿用 df 的
+                      Daily_Return 欄位，沒有才自行計算
+        cum_market: 預先算好的市場累積報酬 ndarray；None 時由日報酬計算
+        return_df: False 時只算 metrics，不複製 df 也不建立結果欄位
+
+    Returns:
+        df_result: 含 Position, Strategy_Return, Cumulative 等欄位（return_df=False 時為 None）
+        metrics: dict 含 Return%, MDD%, Trade_Count, CAGR% 等
+    """
+    n = len(df)
+
+    # 準備欄位
+    if daily_return is None:
+        daily_return = _daily_return(df)
+
+    # 主迴圈只吃 ndarray，避免每根 K 棒走 pandas .iloc
+    close = np.ascontiguousarray(df['Close'].to_numpy(np.float64))
+    sig_present = entry_signal is not None
+    sl_type_code = _SL_TYPE_CODES.get(stop_loss_type, 0)
+    sl_threshold = threshold if sl_type_code else 0.0
+    if not sig_present and not np.isnan(close).any():
+        # Buy & Hold 與進場點無關，整段向量化；含 NaN 時 max 語意不同，走逐日迴圈
+        bt_result = _bt_vectorized_buyhold(close, sl_type_code, sl_threshold, cooldown_days)
+    else:
+        sig = np.ascontiguousarray(entry_signal.to_numpy(np.float64)) if sig_present else np.empty(0)
+        if not _HAS_NUMBA:
+            # 純 Python 執行時逐根取 ndarray 元素會裝箱成 numpy 純量，改用 list 取值較快
+            close, sig = close.tolist(), sig.tolist()
+        bt_result = _bt_core(close, sig_present, sig, sl_threshold, sl_type_code, cooldown_days)
+    position, entry_price, high_watermark, stop_loss_triggered, trade_count = bt_result
+
+    # 計算報酬（position 需要 shift 1 避免 look-ahead bias）；全程用 ndarray，需要時才包成 df
+    position_shifted = np.empty_like(position)
+    position_shifted[:1] = 0
+    position_shifted[1:] = position[:-1]
+    if cum_market is None:
+        cum_market = np.cumprod(1 + daily_return)
+    market_return = (cum_market[-1] - 1) * 100
+
+    if _HAS_NUMBA and not return_df:
+        # 只需 metrics：融合成單次掃描（純 Python 迴圈反而比向量運算慢，故僅限 numba）
+        final_cum, mdd_ratio = _strategy_metrics(
+            np.ascontiguousarray(daily_return, dtype=np.float64), position_shifted,
+        )
+    else:
+        strategy_return = daily_return * position_shifted
+        cum_strategy = np.cumprod(1 + strategy_return)
+        final_cum = cum_strategy[-1]
+
+        # 最大回撤
+        cummax = np.maximum.accumulate(cum_strategy)
+        drawdown = (cum_strategy - cummax) / cummax
+        mdd_ratio = np.nanmin(drawdown)
+
+    # 計算 metrics
+    final_return = (final_cum - 1) * 100
+    mdd = mdd_ratio * 100
 
     # 年化報酬（CAGR）
     years = n / 252  # 假設 252 交易日/年
-    if df['Cumulative_Strategy'].iloc[-1] > 0 and years > 0:
-        cagr = ((df['Cumulative_Strategy'].iloc[-1]) ** (1 / years) - 1) * 100
+    if final_cum > 0 and years > 0:
+        cagr = (final_cum ** (1 / years) - 1) * 100
     else:
         cagr = 0.0
 
     # 停損觸發次數
-    stop_count = df['Stop_Loss_Triggered'].sum()
+    stop_count = stop_loss_triggered.sum()
 
     metrics = {
         "Return%": round(final_return, 2),
@@ -132,6 +284,19 @@ def backtest_stop_loss_strategy(
         "Stop_Count": int(stop_count),
     }
 
+    if not return_df:
+        return None, metrics
+
+    df = df.copy()
+    df['Daily_Return'] = daily_return
+    df['Position'] = position_shifted
+    df['Entry_Price'] = entry_price
+    df['High_Watermark'] = high_watermark
+    df['Stop_Loss_Triggered'] = stop_loss_triggered
+    df['Strategy_Return'] = strategy_return
+    df['Cumulative_Market'] = cum_market
+    df['Cumulative_Strategy'] = cum_strategy
+
     return df, metrics
 
 
@@ -145,6 +310,11 @@ def compare_strategies_for_symbol(df, strategies):
     Returns:
         results: list of dict，每個 dict 含 strategy name + metrics
     """
+    # 日報酬與市場累積報酬與策略無關，只算一次
+    daily_return = _daily_return(df)
+    cum_market = np.cumprod(1 + daily_return)
+
+    # 依序執行：stop_loss_compare 已用多行程分散各標的，這裡再開執行緒只會超額佔用 CPU
     results = []
 
     for s in strategies:
@@ -152,6 +322,9 @@ def compare_strategies_for_symbol(df, strategies):
             df,
             stop_loss_type=s.get("type"),
             threshold=s.get("threshold", -0.35),
+            daily_return=daily_return,
+            cum_market=cum_market,
+            return_df=False,
         )
         results.append({
             "Strategy": s["name"],
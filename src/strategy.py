@@ -1,4 +1,4 @@
-import pandas_ta as ta
+import numpy as np
 from src.indicators import add_ma_indicators, add_rsi_indicators
 
 def apply_ma_strategy(df):
@@ -6,14 +6,14 @@ def apply_ma_strategy(df):
     簡單均線策略：當股價站上 20 日均線時買入，跌破時賣出
     """
     # 計算 20 日移動平均線 (MA)
-    df['MA20'] = ta.sma(df['Close'], length=20)
+    df = add_ma_indicators(df, 20)
     
     # 定義買賣信號 (1: 買入, -1: 賣出, 0: 持有/觀望)
-    df['Signal'] = 0
+    close = df['Close'].to_numpy()
+    ma20 = df['MA20'].to_numpy()
     # 股價 > MA20 且 前一天 股價 <= MA20 (黃金交叉)
-    df.loc[df['Close'] > df['MA20'], 'Signal'] = 1
     # 股價 < MA20 且 前一天 股價 >= MA20 (死亡交叉)
-    df.loc[df['Close'] < df['MA20'], 'Signal'] = -1
+    df['Signal'] = np.select([close > ma20, close < ma20], [1, -1], 0)
     
     return df
 
@@ -39,13 +39,14 @@ def apply_double_factor_strategy(df, ma_length=60, rsi_length=14):
         raise KeyError("Missing RSI column. Check add_rsi_indicators output column name.")
 
     # 2) 條件
-    buy_condition = (df['Close'] > df[ma_col]) & (df['RSI'] < 70)
-    sell_condition = (df['Close'] < df[ma_col]) | (df['RSI'] > 85)
+    close = df['Close'].to_numpy()
+    ma = df[ma_col].to_numpy()
+    rsi = df['RSI'].to_numpy()
+    buy_condition = (close > ma) & (rsi < 70)
+    sell_condition = (close < ma) | (rsi > 85)
 
     # 3) 事件訊號
-    df['Signal'] = 0
-    df.loc[buy_condition, 'Signal'] = 1
-    # 避免同一天買賣同時成立時被覆蓋（你也可以反過來讓賣優先）
-    df.loc[sell_condition & ~buy_condition, 'Signal'] = -1
+    # 買優先：避免同一天買賣同時成立時被覆蓋（你也可以反過來讓賣優先）
+    df['Signal'] = np.select([buy_condition, sell_condition], [1, -1], 0)
 
     return df
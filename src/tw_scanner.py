@@ -12,11 +12,48 @@ from concurrent.futures import ThreadPoolExecutor, as_completed
 
 
 CACHE_FILE = "data/tw_liquid_stocks.json"
+STOCK_LIST_CACHE_FILE = "data/tw_stock_list.json"
+STOCK_LIST_CACHE_DAYS = 30  # 上市櫃清單變動很少，快取較久
 MIN_VOLUME = 1000  # 最低日均成交量（張）
 
 
-def fetch_tw_stock_list():
-    """從 FinMind 取得台股清單"""
+def _load_stock_list_cache():
+    """讀取台股清單快取，過期或不存在回傳 None"""
+    if not os.path.exists(STOCK_LIST_CACHE_FILE):
+        return None
+    try:
+        with open(STOCK_LIST_CACHE_FILE, "r", encoding="utf-8") as f:
+            cache = json.load(f)
+        cache_dt = date.fromisoformat(cache["date"])
+    except (OSError, ValueError, KeyError):
+        return None
+    if (date.today() - cache_dt).days >= STOCK_LIST_CACHE_DAYS:
+        return None
+    return pd.DataFrame(cache["stocks"])
+
+
+def _save_stock_list_cache(df):
+    """寫入台股清單快取；寫入失敗不影響本次已取得的清單"""
+    try:
+        os.makedirs("data", exist_ok=True)
+        with open(STOCK_LIST_CACHE_FILE, "w", encoding="utf-8") as f:
+            json.dump({"date": str(date.today()), "stocks": df.to_dict("records")},
+                      f, ensure_ascii=False)
+    except OSError:
+        pass
+
+
+def fetch_tw_stock_list(force_refresh=False):
+    """從 FinMind 取得台股清單
+
+    Args:
+        force_refresh: 忽略本地清單快取，強制重新向 FinMind 取得
+    """
+    if not force_refresh:
+        cached = _load_stock_list_cache()
+        if cached is not None:
+            return cached
+
     url = "https://api.finmindtrade.com/api/v4/data"
     params = {"dataset": "TaiwanStockInfo"}
 
@@ -26,13 +63,42 @@ def fetch_tw_stock_list():
         if data.get("status") == 200:
             df = pd.DataFrame(data["data"])
             # 只取 4 碼股票（排除 ETF、權證等）
-            df = df[df["stock_id"].str.match(r'^\d{4}$', na=False)]
+            df = df[[isinstance(sid, str) and len(sid) == 4 and sid.isdecimal()
+                     for sid in df["stock_id"]]]
+            _save_stock_list_cache(df)
             return df
     except Exception as e:
         print(f"取得台股清單失敗: {e}")
     return pd.DataFrame()
 
 
+def _download_volumes(symbols):
+    """一次批次下載多檔近 5 日成交量（單一請求，取代逐檔 Ticker.history）
+
+    Returns:
+        dict: {symbol: 日均成交量（張）}，交易日不足 3 天的不列入；整批失敗回傳 None
+    """
+    try:
+        raw = yf.download(symbols, period="5d", auto_adjust=True, progress=False)
+        if raw.empty:
+            return None
+        vol_df = raw["Volume"]
+    except Exception:
+        return None
+
+    if not hasattr(vol_df, "columns"):
+        # 單檔回傳 Series
+        vol_df = vol_df.to_frame(symbols[0])
+
+    volumes = {}
+    for symbol in symbols:
+        if symbol in vol_df.columns:
+            s = vol_df[symbol].dropna()
+            if len(s) >= 3:
+                volumes[symbol] = s.mean() / 1000  # 轉換成張
+    return volumes
+
+
 def get_volume_batch(stock_ids, stock_type_map, max_workers=20):
     """批次取得成交量
 
@@ -46,31 +112,52 @@ def get_volume_batch(stock_ids, stock_type_map, max_workers=20):
     """
     def get_one(stock_id):
         stock_type = stock_type_map.get(stock_id, "twse")
-        # 上市用 .TW，上櫃用 .TWO
-        suffix = ".TW" if stock_type == "twse" else ".TWO"
-        symbol = f"{stock_id}{suffix}"
-
-        try:
-            hist = yf.Ticker(symbol).history(period="5d")
-            if not hist.empty and len(hist) >= 3:
-                vol = hist["Volume"].mean() / 1000  # 轉換成張
-                return stock_id, symbol, vol
-        except:
-            pass
+        # 上市用 .TW，上櫃用 .TWO（上櫃股票有時候用 .TW 也可以）
+        if stock_type == "twse":
+            candidates = (f"{stock_id}.TW",)
+        else:
+            candidates = (f"{stock_id}.TWO", f"{stock_id}.TW")
 
-        # 上櫃股票有時候用 .TW 也可以
-        if suffix == ".TWO":
+        for symbol in candidates:
             try:
-                symbol = f"{stock_id}.TW"
                 hist = yf.Ticker(symbol).history(period="5d")
                 if not hist.empty and len(hist) >= 3:
-                    vol = hist["Volume"].mean() / 1000
+                    vol = hist["Volume"].mean() / 1000  # 轉換成張
                     return stock_id, symbol, vol
-            except:
+            except Exception:
                 pass
 
         return stock_id, None, None
 
+    # 上市用 .TW，上櫃用 .TWO
+    symbol_map = {
+        sid: f"{sid}.TW" if stock_type_map.get(sid, "twse") == "twse" else f"{sid}.TWO"
+        for sid in stock_ids
+    }
+    volumes = _download_volumes(list(symbol_map.values())) if symbol_map else {}
+
+    if volumes is not None:
+        results = [
+            (sid, symbol, volumes[symbol])
+            for sid, symbol in symbol_map.items()
+            if symbol in volumes
+        ]
+        # 上櫃股票有時候用 .TW 也可以
+        retry = {
+            sid: f"{sid}.TW"
+            for sid, symbol in symbol_map.items()
+            if symbol not in volumes and symbol.endswith(".TWO")
+        }
+        if retry:
+            tw_volumes = _download_volumes(list(retry.values())) or {}
+            results.extend(
+                (sid, symbol, tw_volumes[symbol])
+                for sid, symbol in retry.items()
+                if symbol in tw_volumes
+            )
+        return results
+
+    # 批次下載失敗時的備援：逐檔並行抓取
     results = []
     with ThreadPoolExecutor(max_workers=max_workers) as executor:
         futures = {executor.submit(get_one, sid): sid for sid in stock_ids}
@@ -108,7 +195,7 @@ def scan_tw_market(min_volume=MIN_VOLUME, force_refresh=False):
     print("正在掃描台股市場...")
 
     # 1. 取得股票清單
-    df = fetch_tw_stock_list()
+    df = fetch_tw_stock_list(force_refresh=force_refresh)
     if df.empty:
         print("無法取得台股清單")
         return []
@@ -123,7 +210,8 @@ def scan_tw_market(min_volume=MIN_VOLUME, force_refresh=False):
     print(f"正在取得成交量資料（這可能需要幾分鐘）...")
     all_ids = df["stock_id"].tolist()
 
-    # 分批處理避免過載
+    # 分批處理避免過載；批次須依序執行：yf.download 的結果暫存在模組全域狀態，
+    # 同時呼叫會互相覆蓋（單次呼叫內部已有多執行緒）
     batch_size = 100
     all_results = []
 
@@ -1,19 +1,31 @@
-import matplotlib.pyplot as plt
+from matplotlib.figure import Figure
+
+# 共用同一張 Figure：直接用物件 API（不經 pyplot，不會初始化 GUI backend），
+# 批次畫圖時每次只清空 Axes 重畫，記憶體不隨張數累積
+_FIG = None
+_AX = None
+
+def _get_axes():
+    global _FIG, _AX
+    if _FIG is None:
+        _FIG = Figure(figsize=(12, 6))
+        _AX = _FIG.add_subplot()
+    return _FIG, _AX
 
 def plot_result(df, symbol):
-    plt.figure(figsize=(12, 6))
+    fig, ax = _get_axes()
+    ax.clear()
     
     # 畫出市場累積報酬率
-    plt.plot(df['Cumulative_Market_Return'], label='Market (Buy & Hold)', color='gray', alpha=0.5)
+    ax.plot(df['Cumulative_Market_Return'], label='Market (Buy & Hold)', color='gray', alpha=0.5)
     
     # 畫出策略累積報酬率
-    plt.plot(df['Cumulative_Strategy_Return'], label='MA60+RSI Strategy', color='blue')
+    ax.plot(df['Cumulative_Strategy_Return'], label='MA60+RSI Strategy', color='blue')
     
-    plt.title(f"{symbol} Strategy vs Market Performance")
-    plt.legend()
-    plt.grid(True)
+    ax.set_title(f"{symbol} Strategy vs Market Performance")
+    ax.legend()
+    ax.grid(True)
     
     # 儲存圖片
-    plt.savefig(f'data/backtest_{symbol}.png')
-    plt.close()
+    fig.savefig(f'data/backtest_{symbol}.png')
     print(f"圖表已儲存為 backtest_{symbol}.png")
@@ -7,6 +7,7 @@ Usage:
 import argparse
 import os
 import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
 from datetime import date
 
 from src.data_loader import fetch_stock_data
@@ -23,6 +24,29 @@ STRATEGIES = [
 ]
 
 
+MAX_WORKERS = 8  # 並行分析的標的數上限
+
+
+def _analyze_symbol(symbol, period):
+    """抓取單一標的資料並比較所有停損策略（在子行程中執行）
+
+    Returns:
+        (results, status)：results 為 None 時 status 為跳過或失敗原因
+    """
+    try:
+        df = fetch_stock_data(symbol, period=period)
+        if df is None or df.empty or len(df) < 100:
+            return None, "數據不足，跳過"
+
+        results = compare_strategies_for_symbol(df, STRATEGIES)
+    except Exception as e:
+        return None, f"失敗: {e}"
+
+    for r in results:
+        r["Symbol"] = symbol
+    return results, "完成"
+
+
 def run_comparison(symbols, period="3y"):
     """比較多檔股票在不同停損策略下的表現"""
     os.makedirs("data", exist_ok=True)
@@ -33,27 +57,15 @@ def run_comparison(symbols, period="3y"):
     print(f"  停損策略比較  |  測試期間: {period}  |  {date.today()}")
     print(f"{'='*80}\n")
 
-    for symbol in symbols:
-        symbol = symbol.upper().replace('.', '-')
-        print(f"分析 {symbol}...", end=" ")
-
-        try:
-            df = fetch_stock_data(symbol, period=period)
-            if df is None or df.empty or len(df) < 100:
-                print("數據不足，跳過")
-                continue
-
-            results = compare_strategies_for_symbol(df, STRATEGIES)
-
-            for r in results:
-                r["Symbol"] = symbol
-            all_results.extend(results)
-
-            print("完成")
-
-        except Exception as e:
-            print(f"失敗: {e}")
-            continue
+    # 各標的互相獨立（抓資料 + 回測），分散到多個行程；map 保持輸入順序
+    symbols = [symbol.upper().replace('.', '-') for symbol in symbols]
+    max_workers = max(1, min(MAX_WORKERS, len(symbols)))
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        outcomes = executor.map(_analyze_symbol, symbols, [period] * len(symbols))
+        for symbol, (results, status) in zip(symbols, outcomes):
+            print(f"分析 {symbol}... {status}")
+            if results:
+                all_results.extend(results)
 
     if not all_results:
         print("\n沒有成功分析任何標的。")